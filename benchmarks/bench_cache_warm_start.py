@@ -0,0 +1,83 @@
+# Startup cost of warming roblox_cache from its snapshot.
+#
+#   python benchmarks/bench_cache_warm_start.py [--entries 1000,10000,50000]
+#
+# Saves a cache of N entries, then starts a fresh one from the snapshot and reports how long
+# CacheSnapshotter.start() blocks startup, how long the background warm-up takes to finish,
+# the worst event-loop stall while it runs, and what a blocking load would have cost instead.
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roblox_api import CacheSnapshotter, LookupCache, read_cache_snapshot
+
+def make_cache() -> LookupCache:
+    return LookupCache(max_entries=100000, ttl=300, negative_ttl=60, stale_ttl=600)
+
+def fill(cache: LookupCache, size: int):
+    # Same mix the bot stores: username ids, misses, ownership masks, per-item answers
+    now = time.time()
+    for i in range(size):
+        kind = i % 4
+        if kind == 0:
+            cache.set(f"user_player{i}", 1000 + i, stored_at=now - i % 200)
+        elif kind == 1:
+            cache.set(f"user_missing{i}", None, stored_at=now - i % 50)
+        elif kind == 2:
+            cache.set(f"ownership_{i}_1a2b3c4d", i % 1024, stored_at=now - i % 200)
+        else:
+            cache.set(f"gamepass_{i}_5000", bool(i % 2), stored_at=now - i % 200)
+
+async def max_loop_stall(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        worst = max(worst, time.perf_counter() - start - 0.001)
+    return worst * 1000
+
+async def measure(path: str) -> dict:
+    cache = make_cache()
+    snapshots = CacheSnapshotter(cache, path, interval=3600)
+    stop = asyncio.Event()
+    stall_task = asyncio.create_task(max_loop_stall(stop))
+    start = time.perf_counter()
+    await snapshots.start()
+    start_ms = (time.perf_counter() - start) * 1000
+    await snapshots._load_task
+    warm_ms = (time.perf_counter() - start) * 1000
+    stop.set()
+    stall_ms = await stall_task
+    snapshots._task.cancel()
+
+    start = time.perf_counter()
+    blocking = make_cache()
+    blocking.restore(read_cache_snapshot(path))
+    blocking_ms = (time.perf_counter() - start) * 1000
+    return {"start_ms": start_ms, "warm_ms": warm_ms, "stall_ms": stall_ms, "blocking_ms": blocking_ms, "restored": len(cache)}
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    print(f"{'entries':>8} {'restored':>9} {'start ms':>9} {'warm ms':>9} {'stall ms':>9} {'blocking ms':>12} {'file KB':>8}")
+    for size in (int(s) for s in args.entries.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "roblox_cache.json")
+            source = make_cache()
+            fill(source, size)
+            await CacheSnapshotter(source, path).save()
+            result = await measure(path)
+            size_kb = os.path.getsize(path) / 1024
+            print(f"{size:>8} {result['restored']:>9} {result['start_ms']:>9.2f} {result['warm_ms']:>9.1f} {result['stall_ms']:>9.1f} {result['blocking_ms']:>12.1f} {size_kb:>8.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+# /claim-roles pipeline: old one-at-a-time loop vs. concurrent checks + one add_roles call.
+#
+#   python benchmarks/bench_claim_roles.py [--mappings 1,10,50] [--latency-ms 50] [--discord-ms 100] [--rate 100]
+#
+# Roblox calls go to the local stub with --latency-ms per request; add_roles sleeps
+# --discord-ms to stand in for the Discord round trip. --rate sets the inventory limiter
+# (requests/second) so the numbers show the pipeline rather than the production budget.
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+from roblox_api import TokenBucketLimiter
+from stub_roblox import RobloxStub
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+
+class FakeGuild:
+    def __init__(self, roles):
+        self.id = 1
+        self.roles_by_id = {role.id: role for role in roles}
+
+    def get_role(self, role_id: int):
+        return self.roles_by_id.get(role_id)
+
+class FakeMember:
+    def __init__(self, guild: FakeGuild, discord_latency: float):
+        self.id = 42
+        self.guild = guild
+        self.roles = []
+        self.discord_latency = discord_latency
+        self.add_roles_calls = 0
+
+    async def add_roles(self, *roles, reason=None):
+        self.add_roles_calls += 1
+        await asyncio.sleep(self.discord_latency)
+        self.roles.extend(roles)
+
+async def claim_sequential(member: FakeMember, roblox_id: int) -> int:
+    # The pre-pipeline loop from claim_roles
+    added = 0
+    for mapping in bot.config["gamepass_roles"]:
+        role = member.guild.get_role(mapping["role_id"])
+        if role is None or role in member.roles:
+            continue
+        if await bot.has_gamepass(roblox_id, mapping["gamepass_id"]):
+            await member.add_roles(role)
+            added += 1
+    return added
+
+async def claim_pipeline(member: FakeMember, roblox_id: int) -> int:
+    results = await bot.claim_gamepass_roles(member, roblox_id)
+    return sum(1 for result in results if result["status"] == "added")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mappings", default="1,10,50")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--discord-ms", type=float, default=100.0)
+    parser.add_argument("--rate", type=float, default=100.0)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    stub = RobloxStub(latency_ms=args.latency_ms)
+    base_url = await stub.start()
+    bot.ROBLOX_API_URL = base_url + "/v1/users/{user_id}/items/GamePass/{gamepass_id}"
+    bot.ROBLOX_INVENTORY_LIST_URL = base_url + "/v2/users/{user_id}/inventory/34"
+    bot.roblox_limiters["inventory"] = TokenBucketLimiter("inventory", args.rate, int(args.rate), bot.ROBLOX_MAX_IN_FLIGHT)
+
+    print(f"{'mappings':>8} {'mode':>10} {'ms':>9} {'added':>6} {'add_roles':>10} {'roblox calls':>13}")
+    roblox_id = 1000
+    try:
+        for count in (int(c) for c in args.mappings.split(",")):
+            bot.config["gamepass_roles"] = [
+                {"gamepass_id": 5000 + i, "role_id": 9000 + i, "description": f"Tier {i}"}
+                for i in range(count)
+            ]
+            guild = FakeGuild([FakeRole(9000 + i) for i in range(count)])
+            for mode, claim in (("sequential", claim_sequential), ("pipeline", claim_pipeline)):
+                roblox_id += 1  # Fresh user so nothing is served from roblox_cache
+                member = FakeMember(guild, args.discord_ms / 1000)
+                calls_before = sum(stub.requests.values())
+                start = time.perf_counter()
+                added = await claim(member, roblox_id)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                calls = sum(stub.requests.values()) - calls_before
+                print(f"{count:>8} {mode:>10} {elapsed_ms:>9.0f} {added:>6} {member.add_roles_calls:>10} {calls:>13}")
+    finally:
+        await bot.close_http_session()
+        await stub.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+# /download latency vs. number of stored codes.
+#
+#   python benchmarks/bench_download.py [--sizes 1000,10000,100000,1000000] [--requests 2000]
+#
+# Fills a JSON link store with N generated codes and times handle_download for a valid
+# token and for a bogus one. With the token index both should stay flat as N grows; the
+# "scan" column is the old linear search over generated_codes for comparison.
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp.test_utils import make_mocked_request
+
+import bot
+from storage import JsonLinkStore
+
+def build_store(directory: str, size: int) -> JsonLinkStore:
+    store = JsonLinkStore(os.path.join(directory, "linked_accounts.json"), os.path.join(directory, "linked_accounts.journal.jsonl"))
+    expiry = time.time() + 3600
+    generated_codes = store.accounts["generated_codes"]
+    for i in range(size):
+        generated_codes[f"code{i}"] = {"discord_id": str(i), "expiry": expiry, "download_token": secrets.token_urlsafe(16)}
+    store.rebuild_indexes()
+    return store
+
+def linear_scan(store: JsonLinkStore, token: str):
+    for code, data in store.accounts["generated_codes"].items():
+        if data.get("download_token") == token:
+            return code
+    return None
+
+async def time_download(token: str, requests: int) -> float:
+    request = make_mocked_request("GET", f"/download?token={token}")
+    start = time.perf_counter()
+    for _ in range(requests):
+        await bot.handle_download(request)
+    return (time.perf_counter() - start) / requests * 1e6
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    print(f"{'codes':>10} {'valid us':>10} {'bogus us':>10} {'scan us':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            bot.ZIP_FILE_PATH = os.path.join(directory, "app.zip")
+            with open(bot.ZIP_FILE_PATH, "wb") as f:
+                f.write(b"PK")
+            bot.link_store = build_store(directory, size)
+            # The last code issued is the worst case for the old scan
+            valid_token = bot.link_store.accounts["generated_codes"][f"code{size - 1}"]["download_token"]
+            valid_us = await time_download(valid_token, args.requests)
+            bogus_us = await time_download(secrets.token_urlsafe(16), args.requests)
+            scan_runs = max(1, min(args.requests, 10_000_000 // size))
+            start = time.perf_counter()
+            for _ in range(scan_runs):
+                linear_scan(bot.link_store, valid_token)
+            scan_us = (time.perf_counter() - start) / scan_runs * 1e6
+            print(f"{size:>10} {valid_us:>10.1f} {bogus_us:>10.1f} {scan_us:>10.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
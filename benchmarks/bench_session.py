@@ -0,0 +1,79 @@
+# Per-call ClientSession vs. the bot's shared, pooled session against the local Roblox stub.
+#
+#   python benchmarks/bench_session.py [--requests 500] [--concurrency 1,10] [--latency-ms 0]
+#
+# The stub speaks plain HTTP, so this only captures the TCP connect + session setup cost;
+# against the real HTTPS endpoints the per-call TLS handshake widens the gap further.
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+
+import bot
+from stub_roblox import RobloxStub
+
+async def lookup_per_call(url: str, username: str):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json={"usernames": [username]}, timeout=bot.ROBLOX_TIMEOUTS["users"]) as response:
+            return await response.json()
+
+async def lookup_pooled(session: aiohttp.ClientSession, url: str, username: str):
+    async with session.post(url, json={"usernames": [username]}, timeout=bot.ROBLOX_TIMEOUTS["users"]) as response:
+        return await response.json()
+
+async def run(mode: str, url: str, requests: int, concurrency: int):
+    session = bot.create_http_session() if mode == "pooled" else None
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            if session is None:
+                await lookup_per_call(url, f"user{i}")
+            else:
+                await lookup_pooled(session, url, f"user{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    if session is not None:
+        await session.close()
+    latencies.sort()
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "rps": requests / elapsed
+    }
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", default="1,10")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    stub = RobloxStub(latency_ms=args.latency_ms)
+    base_url = await stub.start()
+    url = base_url + "/v1/usernames/users"
+    print(f"{'mode':>9} {'conc':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>9}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            for mode in ("per-call", "pooled"):
+                result = await run(mode, url, args.requests, concurrency)
+                print(f"{mode:>9} {concurrency:>5} {result['mean_ms']:>9.2f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['rps']:>9.0f}")
+    finally:
+        await stub.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+# Local stand-in for users.roblox.com and inventory.roblox.com.
+#
+#   python benchmarks/stub_roblox.py --port 8100 --latency-ms 50
+#
+# Point the bot at it with ROBLOX_USERS_API=http://127.0.0.1:8100 and
+# ROBLOX_INVENTORY_API=http://127.0.0.1:8100. Benchmarks start it in-process via RobloxStub.
+import argparse
+import asyncio
+import zlib
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+class RobloxStub:
+    def __init__(self, latency_ms: float = 0.0, owned_fraction: float = 0.5, private_fraction: float = 0.0, gamepass_ids=range(5000, 5200)):
+        self.latency = latency_ms / 1000
+        self.owned_fraction = owned_fraction
+        self.private_fraction = private_fraction
+        self.gamepass_ids = list(gamepass_ids)  # What inventory listings are built from
+        self.requests = Counter()
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    # Deterministic fake data so repeated runs are comparable
+    @staticmethod
+    def user_id_for(username: str) -> Optional[int]:
+        if username.lower().startswith("missing"):
+            return None
+        return zlib.crc32(username.lower().encode()) % 1_000_000_000 + 1
+
+    def owns(self, user_id: int, gamepass_id: int) -> bool:
+        return zlib.crc32(f"{user_id}:{gamepass_id}".encode()) % 1000 < self.owned_fraction * 1000
+
+    def is_private(self, user_id: int) -> bool:
+        return zlib.crc32(f"private:{user_id}".encode()) % 1000 < self.private_fraction * 1000
+
+    async def handle_usernames(self, request):
+        self.requests["usernames"] += 1
+        await asyncio.sleep(self.latency)
+        body = await request.json()
+        data = []
+        for username in body.get("usernames", []):
+            user_id = self.user_id_for(username)
+            if user_id is not None:
+                data.append({"requestedUsername": username, "name": username, "displayName": username, "id": user_id, "hasVerifiedBadge": False})
+        return web.json_response({"data": data})
+
+    async def handle_inventory(self, request):
+        self.requests["inventory"] += 1
+        await asyncio.sleep(self.latency)
+        user_id = int(request.match_info["user_id"])
+        gamepass_id = int(request.match_info["gamepass_id"])
+        data = []
+        if self.owns(user_id, gamepass_id):
+            data.append({"type": "GamePass", "id": gamepass_id, "name": f"Gamepass {gamepass_id}", "instanceId": None})
+        return web.json_response({"previousPageCursor": None, "nextPageCursor": None, "data": data})
+
+    async def handle_inventory_list(self, request):
+        self.requests["inventory_list"] += 1
+        await asyncio.sleep(self.latency)
+        user_id = int(request.match_info["user_id"])
+        if self.is_private(user_id):
+            return web.json_response({"errors": [{"code": 4, "message": "You don't have permissions to view the specified user's inventory."}]}, status=403)
+        limit = int(request.query.get("limit", 10))
+        offset = int(request.query.get("cursor") or 0)
+        owned = [gamepass_id for gamepass_id in self.gamepass_ids if self.owns(user_id, gamepass_id)]
+        page = owned[offset:offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(owned) else None
+        data = [{"assetId": gamepass_id, "name": f"Gamepass {gamepass_id}", "assetType": "GamePass"} for gamepass_id in page]
+        return web.json_response({"previousPageCursor": None, "nextPageCursor": next_cursor, "data": data})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/usernames/users", self.handle_usernames)
+        app.router.add_get("/v1/users/{user_id}/items/GamePass/{gamepass_id}", self.handle_inventory)
+        app.router.add_get("/v2/users/{user_id}/inventory/34", self.handle_inventory_list)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.make_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        bound_port = self.runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--owned-fraction", type=float, default=0.5)
+    parser.add_argument("--private-fraction", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = RobloxStub(latency_ms=args.latency_ms, owned_fraction=args.owned_fraction, private_fraction=args.private_fraction)
+    base_url = await stub.start(args.host, args.port)
+    print(f"Roblox stub listening on {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -1,909 +1,1237 @@
-import discord
-from discord import app_commands
-from discord.ext import commands
-import json
-import os
-from dotenv import load_dotenv
-from aiohttp import web
-import aiohttp
-import asyncio
-from datetime import datetime, timedelta
-import secrets
-import time
-from typing import Dict, Optional
-import logging
-
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-linked_accounts_file = "linked_accounts.json"
-CONFIG_FILE = "config.json"
-ADMIN_ROLE_NAME = "Admin"
-SUPPORTER_ROLE_NAME = "Supporter"
-OWNER_ID = 1322627642746339432
-ROBLOX_API_URL = "https://inventory.roblox.com/v1/users/{user_id}/items/GamePass/{gamepass_id}"
-REDEEM_URL = "/redeem"
-DOWNLOAD_URL = "/download"
-ZIP_FILE_PATH = "secure_downloads/app.zip"
-
-# Configurable download base URL (set in .env or fallback to Render)
-DOWNLOAD_BASE_URL = os.getenv("DOWNLOAD_BASE_URL", f"https://{os.environ.get('RENDER_EXTERNAL_HOSTNAME', 'linker-for-dc.onrender.com')}")
-
-# Rate limiting and caching
-roblox_cache: Dict[str, Dict] = {}
-cache_expiry = 300
-last_request_time = 0
-min_request_interval = 1.0
-
-# In-memory storage for pending codes
-pending_codes: Dict[str, Dict] = {}
-
-# ------------------- Load Config & Accounts -------------------
-
-try:
-    with open(CONFIG_FILE, "r") as f:
-        config = json.load(f)
-except FileNotFoundError:
-    config = {"gamepass_roles": []}
-
-try:
-    with open(linked_accounts_file, "r") as f:
-        temp_accounts = json.load(f)
-        if not isinstance(temp_accounts, dict) or ("discord_to_roblox" not in temp_accounts and "roblox_to_discord" not in temp_accounts):
-            discord_to_roblox = {}
-            roblox_to_discord = {}
-            for discord_id, roblox_id in temp_accounts.items():
-                discord_to_roblox[discord_id] = roblox_id
-                roblox_to_discord[str(roblox_id)] = discord_id
-            linked_accounts = {
-                "discord_to_roblox": discord_to_roblox,
-                "roblox_to_discord": roblox_to_discord,
-                "force_linked_users": [],
-                "generated_codes": {},
-                "linked_devices": {}
-            }
-        else:
-            linked_accounts = temp_accounts
-            if "force_linked_users" not in linked_accounts:
-                linked_accounts["force_linked_users"] = []
-            if "generated_codes" not in linked_accounts:
-                linked_accounts["generated_codes"] = {}
-            if "linked_devices" not in linked_accounts:
-                linked_accounts["linked_devices"] = {}
-except FileNotFoundError:
-    linked_accounts = {
-        "discord_to_roblox": {},
-        "roblox_to_discord": {},
-        "force_linked_users": [],
-        "generated_codes": {},
-        "linked_devices": {}
-    }
-
-def save_linked_accounts():
-    try:
-        with open(linked_accounts_file, "w") as f:
-            json.dump(linked_accounts, f, indent=2)
-        logger.info("Saved linked_accounts.json")
-    except Exception as e:
-        logger.error(f"Failed to save linked_accounts.json: {e}")
-
-def is_admin(interaction: discord.Interaction) -> bool:
-    try:
-        role = discord.utils.get(interaction.guild.roles, name=ADMIN_ROLE_NAME)
-        if role is None:
-            logger.warning(f"Admin role '{ADMIN_ROLE_NAME}' not found in guild {interaction.guild.id}")
-            return False
-        return (role in interaction.user.roles) or (interaction.user.id == OWNER_ID)
-    except AttributeError:
-        logger.warning(f"No guild context for admin check in interaction {interaction.id}")
-        return False
-
-def has_supporter_role(member: discord.Member) -> bool:
-    try:
-        if not member.guild:
-            logger.warning(f"No guild context for member {member.id}")
-            return False
-        role = discord.utils.get(member.guild.roles, name=SUPPORTER_ROLE_NAME)
-        if role is None:
-            logger.warning(f"Supporter role '{SUPPORTER_ROLE_NAME}' not found in guild {member.guild.id}")
-            return False
-        return role in member.roles
-    except AttributeError:
-        logger.warning(f"Invalid member object for supporter role check: {member.id}")
-        return False
-
-# ------------------- Rate Limited API Calls -------------------
-
-async def rate_limited_request():
-    global last_request_time
-    current_time = time.time()
-    elapsed = current_time - last_request_time
-    if elapsed < min_request_interval:
-        await asyncio.sleep(min_request_interval - elapsed)
-    last_request_time = time.time()
-
-async def get_roblox_user_id(username: str) -> Optional[int]:
-    cache_key = f"user_{username}"
-    if cache_key in roblox_cache:
-        cached_data = roblox_cache[cache_key]
-        if time.time() - cached_data["timestamp"] < cache_expiry:
-            return cached_data["data"]
-    
-    await rate_limited_request()
-    url = "https://users.roblox.com/v1/usernames/users"
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json={"usernames": [username]}, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    user_data = await response.json()
-                    if user_data["data"]:
-                        user_id = user_data["data"][0]["id"]
-                        roblox_cache[cache_key] = {
-                            "data": user_id,
-                            "timestamp": time.time()
-                        }
-                        return user_id
-                elif response.status == 429:
-                    retry_after = int(response.headers.get("Retry-After", 5))
-                    await asyncio.sleep(retry_after)
-                    return await get_roblox_user_id(username)
-    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-        logger.error(f"Error in get_roblox_user_id: {e}")
-    return None
-
-async def has_gamepass(user_id: int, gamepass_id: int) -> bool:
-    cache_key = f"gamepass_{user_id}_{gamepass_id}"
-    if cache_key in roblox_cache:
-        cached_data = roblox_cache[cache_key]
-        if time.time() - cached_data["timestamp"] < cache_expiry:
-            return cached_data["data"]
-    
-    await rate_limited_request()
-    url = ROBLOX_API_URL.format(user_id=user_id, gamepass_id=gamepass_id)
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    gamepasses = await response.json()
-                    has_pass = bool(gamepasses.get("data", []))
-                    roblox_cache[cache_key] = {
-                        "data": has_pass,
-                        "timestamp": time.time()
-                    }
-                    return has_pass
-                elif response.status == 429:
-                    retry_after = int(response.headers.get("Retry-After", 5))
-                    await asyncio.sleep(retry_after)
-                    return await has_gamepass(user_id, gamepass_id)
-    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-        logger.error(f"Error in has_gamepass: {e}")
-    return False
-
-# ------------------- Code Verification -------------------
-
-async def verify_code_internal(code: str, discord_id: str) -> Optional[str]:
-    try:
-        if code not in pending_codes:
-            logger.warning(f"Code {code} not found in pending_codes for discord_id {discord_id}")
-            return None
-        code_data = pending_codes[code]
-        if code_data["discord_id"] != discord_id:
-            logger.warning(f"Code {code} does not match discord_id {discord_id}")
-            return None
-        if time.time() > code_data["expiry"]:
-            logger.warning(f"Code {code} expired for discord_id {discord_id}")
-            del pending_codes[code]
-            save_linked_accounts()
-            return None
-        download_token = code_data["download_token"]
-        
-        # Store in linked_accounts.json
-        linked_accounts["generated_codes"][code] = {
-            "discord_id": discord_id,
-            "expiry": code_data["expiry"],
-            "download_token": download_token
-        }
-        linked_accounts["linked_devices"][discord_id] = {"linked": True}
-        save_linked_accounts()
-        del pending_codes[code]
-        logger.info(f"Code {code} verified and stored for discord_id {discord_id}")
-        return download_token
-    except Exception as e:
-        logger.error(f"Error in verify_code_internal for code {code}, discord_id {discord_id}: {str(e)}")
-        return None
-
-async def invalidate_user_codes(discord_id: str):
-    try:
-        # Remove from pending_codes
-        codes_to_remove = [code for code, data in pending_codes.items() if data["discord_id"] == discord_id]
-        for code in codes_to_remove:
-            del pending_codes[code]
-            logger.info(f"Removed pending code {code} for discord_id {discord_id}")
-        # Remove from linked_accounts
-        codes_to_remove = [code for code, data in linked_accounts["generated_codes"].items() if data["discord_id"] == discord_id]
-        for code in codes_to_remove:
-            del linked_accounts["generated_codes"][code]
-        if discord_id in linked_accounts["linked_devices"]:
-            del linked_accounts["linked_devices"][discord_id]
-        save_linked_accounts()
-        logger.info(f"Invalidated codes for discord_id {discord_id}")
-    except Exception as e:
-        logger.error(f"Error in invalidate_user_codes for discord_id {discord_id}: {e}")
-
-# ------------------- Discord Bot Commands -------------------
-
-@bot.tree.command(name="link-account", description="Link your account to download the application (Supporter role required).")
-async def link_account(interaction: discord.Interaction):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for link-account, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if not has_supporter_role(interaction.user):
-            embed.title = "❌ Permission Denied"
-            embed.description = f"You need the '{SUPPORTER_ROLE_NAME}' role in this server to use this command."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"link-account denied for discord_id {discord_id}: no Supporter role")
-            return
-
-        if discord_id in linked_accounts["linked_devices"]:
-            embed.title = "❌ Already Linked"
-            embed.description = "Your account is already linked to a device. Use `/change-account` to link a new device."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"link-account denied for discord_id {discord_id}: already linked")
-            return
-
-        embed.title = "✅ Ready to Generate Code"
-        embed.description = "Run the terminal application to generate a verification code. Then use `/verify-code <code>` to receive a token."
-        embed.color = discord.Color.green()
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        logger.info(f"link-account called by discord_id {discord_id} in guild {interaction.guild.id}")
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in link_account for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in link_account for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in link_account for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="verify-code", description="Verify your code to receive a token (Supporter role required).")
-async def verify_code(interaction: discord.Interaction, code: str):
-    discord_id = str(interaction.user.id)
-    try:
-        await interaction.response.defer(ephemeral=True)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for verify-code, discord_id {discord_id}, code {code}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if not interaction.guild:
-            embed.title = "❌ Invalid Context"
-            embed.description = "This command must be run in a server."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"verify-code denied for discord_id {discord_id}: no guild context")
-            return
-
-        if not has_supporter_role(interaction.user):
-            embed.title = "❌ Permission Denied"
-            embed.description = f"You need the '{SUPPORTER_ROLE_NAME}' role in this server to use this command."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"verify-code denied for discord_id {discord_id}: no Supporter role")
-            return
-
-        logger.info(f"Attempting to verify code {code} for discord_id {discord_id}")
-        download_token = await verify_code_internal(code, discord_id)
-        if not download_token:
-            embed.title = "❌ Invalid or Expired Code"
-            embed.description = "The code is invalid or has expired. Run the terminal app to generate a new code and try again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"verify-code failed for discord_id {discord_id}: invalid or expired code {code}")
-            return
-
-        embed.title = "✅ Code Verified"
-        embed.description = f"Your token is: `{download_token}`\nUse this token in the terminal application to download and run the application."
-        embed.color = discord.Color.green()
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        logger.info(f"verify-code successful for discord_id {discord_id}, code {code} in guild {interaction.guild.id}")
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in verify_code for discord_id {discord_id}, code {code}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in verify_code for discord_id {discord_id}, code {code}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in verify_code for discord_id {discord_id}, code {code}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred while verifying the code. Please try again or contact an admin.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="change-account", description="Unlink your current device and link a new one (Supporter role required).")
-async def change_account(interaction: discord.Interaction):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for change-account, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if not has_supporter_role(interaction.user):
-            embed.title = "❌ Permission Denied"
-            embed.description = f"You need the '{SUPPORTER_ROLE_NAME}' role in this server to use this command."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"change-account denied for discord_id {discord_id}: no Supporter role")
-            return
-
-        if discord_id not in linked_accounts["linked_devices"]:
-            embed.title = "❌ No Device Linked"
-            embed.description = "You haven't linked a device yet. Use `/link-account` to start the process."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"change-account denied for discord_id {discord_id}: no device linked")
-            return
-
-        await invalidate_user_codes(discord_id)
-        embed.title = "✅ Device Unlinked"
-        embed.description = "Your previous device link has been removed. Run the terminal app to generate a new verification code and use `/verify-code`."
-        embed.color = discord.Color.green()
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        logger.info(f"change-account successful for discord_id {discord_id} in guild {interaction.guild.id}")
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in change_account for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in change_account for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in change_account for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="link-roblox", description="Link your Roblox account to your Discord account.")
-async def link_roblox(interaction: discord.Interaction, username: str):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for link-roblox, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        user_id = await get_roblox_user_id(username)
-        if not user_id:
-            embed.title = "❌ User Not Found"
-            embed.description = f"Could not find a Roblox user with the username: `{username}`"
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        roblox_id_str = str(user_id)
-
-        if discord_id in linked_accounts["discord_to_roblox"]:
-            embed.title = "❌ Already Linked"
-            embed.description = "Your Discord account is already linked to a Roblox account."
-            embed.color = discord.Color.red()
-        elif roblox_id_str in linked_accounts["roblox_to_discord"]:
-            embed.title = "❌ Already Linked"
-            embed.description = "This Roblox account is already linked to another Discord user."
-            embed.color = discord.Color.red()
-        else:
-            linked_accounts["discord_to_roblox"][discord_id] = user_id
-            linked_accounts["roblox_to_discord"][roblox_id_str] = discord_id
-            save_linked_accounts()
-            embed.title = "✅ Account Linked"
-            embed.description = f"Successfully linked to Roblox account: `{username}`"
-            embed.color = discord.Color.green()
-
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        logger.info(f"link-roblox called by discord_id {discord_id}, username {username}")
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in link_roblox for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in link_roblox for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in link_roblox for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="unlink-roblox", description="Unlink your Roblox account from your Discord account.")
-async def unlink_roblox(interaction: discord.Interaction):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for unlink-roblox, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if discord_id in linked_accounts.get("force_linked_users", []):
-            embed.title = "❌ Cannot Unlink"
-            embed.description = "This account was force-linked by an admin and cannot be unlinked."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if discord_id in linked_accounts["discord_to_roblox"]:
-            await remove_gamepass_roles(interaction.user)
-            roblox_id = str(linked_accounts["discord_to_roblox"][discord_id])
-            del linked_accounts["discord_to_roblox"][discord_id]
-            del linked_accounts["roblox_to_discord"][roblox_id]
-            save_linked_accounts()
-
-            embed.title = "✅ Account Unlinked"
-            embed.color = discord.Color.green()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"unlink-roblox successful for discord_id {discord_id}")
-        else:
-            embed.title = "❌ No Account Linked"
-            embed.description = "You don't have any Roblox account linked."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in unlink_roblox for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in unlink_roblox for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in unlink_roblox for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="claim-roles", description="Claim your roles based on your Roblox gamepasses.")
-async def claim_roles(interaction: discord.Interaction):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for claim-roles, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if discord_id not in linked_accounts["discord_to_roblox"]:
-            embed.title = "❌ Not Linked"
-            embed.description = "You need to link your Roblox account first using `/link-roblox`!"
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        roblox_id = linked_accounts["discord_to_roblox"][discord_id]
-        added_roles = []
-
-        for mapping in config["gamepass_roles"]:
-            gamepass_id = mapping["gamepass_id"]
-            role_id = mapping["role_id"]
-            description = mapping["description"]
-            role = interaction.guild.get_role(role_id)
-            if role is None:
-                continue
-            if role in interaction.user.roles:
-                continue
-            if await has_gamepass(roblox_id, gamepass_id):
-                await interaction.user.add_roles(role)
-                added_roles.append(description)
-
-        embed.title = "🎮 Role Claim"
-        if added_roles:
-            embed.description = "✅ Successfully claimed your roles!"
-            embed.color = discord.Color.green()
-        else:
-            embed.description = "ℹ️ You have no new roles to claim."
-            embed.color = discord.Color.blue()
-
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        logger.info(f"claim-roles called by discord_id {discord_id}")
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in claim_roles for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in claim_roles for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in claim_roles for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="list-linked", description="(Admin) List all linked accounts.")
-@app_commands.checks.has_role(ADMIN_ROLE_NAME)
-async def list_linked(interaction: discord.Interaction):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for list-linked, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if not is_admin(interaction):
-            embed.title = "❌ Permission Denied"
-            embed.description = "You do not have permission to use this command."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"list-linked denied for discord_id {discord_id}: not admin")
-            return
-
-        description = ""
-        for discord_id, roblox_id in linked_accounts["discord_to_roblox"].items():
-            description += f"<@{discord_id}> ➜ `{roblox_id}`\n"
-
-        embed.title = "🔗 Linked Accounts"
-        embed.description = description or "None found."
-        embed.color = discord.Color.blue()
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        logger.info(f"list-linked called by discord_id {discord_id}")
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in list_linked for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in list_linked for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in list_linked for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="force-link", description="(Admin) Force link a user to a Roblox username.")
-@app_commands.checks.has_role(ADMIN_ROLE_NAME)
-async def force_link(interaction: discord.Interaction, discord_user: discord.User, roblox_username: str):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        target_discord_id = str(discord_user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for force-link, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if not is_admin(interaction):
-            embed.title = "❌ Permission Denied"
-            embed.description = "You do not have permission to use this command."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"force-link denied for discord_id {discord_id}: not admin")
-            return
-
-        user_id = await get_roblox_user_id(roblox_username)
-        if not user_id:
-            embed.title = "❌ Roblox User Not Found"
-            embed.description = f"Could not find a Roblox user with the username: `{roblox_username}`"
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        roblox_id = str(user_id)
-
-        linked_accounts["discord_to_roblox"][target_discord_id] = user_id
-        linked_accounts["roblox_to_discord"][roblox_id] = target_discord_id
-        if target_discord_id not in linked_accounts["force_linked_users"]:
-            linked_accounts["force_linked_users"].append(target_discord_id)
-
-        save_linked_accounts()
-        embed.title = "✅ Force Linked"
-        embed.description = f"Successfully linked {discord_user.mention} to `{roblox_username}`"
-        embed.color = discord.Color.green()
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        logger.info(f"force-link called by discord_id {discord_id}, linked {target_discord_id} to {roblox_username}")
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in force_link for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in force_link for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in force_link for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-@bot.tree.command(name="admin-unlink", description="(Admin) Unlink a user manually.")
-@app_commands.checks.has_role(ADMIN_ROLE_NAME)
-async def admin_unlink(interaction: discord.Interaction, discord_user: discord.User):
-    try:
-        await interaction.response.defer(ephemeral=True)
-        discord_id = str(interaction.user.id)
-        target_discord_id = str(discord_user.id)
-        embed = discord.Embed(color=discord.Color.blue())
-
-        if interaction.is_expired():
-            logger.warning(f"Interaction expired for admin-unlink, discord_id {discord_id}")
-            embed.title = "❌ Interaction Expired"
-            embed.description = "This interaction has timed out. Please try the command again."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        if not is_admin(interaction):
-            embed.title = "❌ Permission Denied"
-            embed.description = "You do not have permission to use this command."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"admin-unlink denied for discord_id {discord_id}: not admin")
-            return
-
-        if target_discord_id in linked_accounts["discord_to_roblox"]:
-            roblox_id = str(linked_accounts["discord_to_roblox"][target_discord_id])
-            del linked_accounts["discord_to_roblox"][target_discord_id]
-            del linked_accounts["roblox_to_discord"][roblox_id]
-            if target_discord_id in linked_accounts["force_linked_users"]:
-                linked_accounts["force_linked_users"].remove(target_discord_id)
-            save_linked_accounts()
-            embed.title = "✅ Unlinked"
-            embed.description = f"Successfully unlinked {discord_user.mention}"
-            embed.color = discord.Color.green()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            logger.info(f"admin-unlink successful for discord_id {target_discord_id}")
-        else:
-            embed.title = "❌ User Not Linked"
-            embed.description = "This user is not linked to any Roblox account."
-            embed.color = discord.Color.red()
-            await interaction.followup.send(embed=embed, ephemeral=True)
-    except discord.errors.NotFound as e:
-        logger.error(f"NotFound in admin_unlink for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except discord.errors.HTTPException as e:
-        logger.error(f"HTTPException in admin_unlink for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-    except Exception as e:
-        logger.error(f"Error in admin-unlink for discord_id {discord_id}: {str(e)}")
-        try:
-            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except:
-            pass
-
-# ------------------- Helper Functions -------------------
-
-async def remove_gamepass_roles(member: discord.Member):
-    try:
-        role_ids = [mapping["role_id"] for mapping in config["gamepass_roles"]]
-        roles_to_remove = [role for role in member.roles if role.id in role_ids]
-        if roles_to_remove:
-            await member.remove_roles(*roles_to_remove)
-            logger.info(f"Removed gamepass roles from {member.id}")
-    except Exception as e:
-        logger.error(f"Error in remove_gamepass_roles for member {member.id}: {e}")
-
-# ------------------- Render Backend Webserver -------------------
-
-async def handle_redeem(request):
-    try:
-        data = await request.json()
-        code = data.get("code")
-        discord_id = data.get("discord_id")
-        if not code or not discord_id:
-            logger.warning(f"Missing code or discord_id in /redeem: {data}")
-            return web.json_response({"error": "Missing code or discord_id"}, status=400)
-
-        download_token = secrets.token_urlsafe(16)
-        expiry = time.time() + 300  # 5 minutes
-        pending_codes[code] = {
-            "discord_id": discord_id,
-            "expiry": expiry,
-            "download_token": download_token
-        }
-        # Persist to linked_accounts.json immediately to survive restarts
-        linked_accounts["generated_codes"][code] = {
-            "discord_id": discord_id,
-            "expiry": expiry,
-            "download_token": download_token
-        }
-        save_linked_accounts()
-        logger.info(f"Stored code {code} for discord_id {discord_id} in /redeem")
-        return web.json_response({"message": "Code stored successfully"})
-    except Exception as e:
-        logger.error(f"Error in handle_redeem: {str(e)}")
-        return web.json_response({"error": "Server error"}, status=500)
-
-async def handle_download(request):
-    try:
-        token = request.query.get("token")
-        if not token:
-            logger.warning("Missing token in /download")
-            return web.json_response({"error": "Missing token"}, status=400)
-
-        for code, data in list(linked_accounts["generated_codes"].items()):
-            if data.get("download_token") == token and time.time() < data["expiry"]:
-                if not os.path.exists(ZIP_FILE_PATH):
-                    logger.error(f"Zip file not found at {ZIP_FILE_PATH}")
-                    return web.json_response({"error": "File not found"}, status=404)
-                logger.info(f"Serving zip file for token {token}")
-                return web.FileResponse(ZIP_FILE_PATH, headers={
-                    "Content-Disposition": "attachment; filename=app.zip"
-                })
-        
-        logger.warning(f"Invalid or expired token in /download: {token}")
-        return web.json_response({"error": "Invalid or expired token"}, status=401)
-    except Exception as e:
-        logger.error(f"Error in handle_download: {str(e)}")
-        return web.json_response({"error": "Server error"}, status=500)
-
-async def run_webserver():
-    try:
-        app = web.Application()
-        app.router.add_get('/', lambda r: web.Response(text="Bot is running"))
-        app.router.add_post('/redeem', handle_redeem)
-        app.router.add_get('/download', handle_download)
-        port = int(os.environ.get("PORT", 8080))
-        runner = web.AppRunner(app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', port)
-        await site.start()
-        logger.info(f"Web server running on port {port}")
-    except Exception as e:
-        logger.error(f"Error starting webserver: {e}")
-
-# ------------------- Events -------------------
-
-@bot.event
-async def on_ready():
-    try:
-        await bot.tree.sync()
-        logger.info(f"Logged in as {bot.user}")
-    except Exception as e:
-        logger.error(f"Error in on_ready: {e}")
-
-# ------------------- Run Bot & Webserver -------------------
-
-async def main():
-    await run_webserver()
-    await bot.start(os.getenv("DISCORD_TOKEN"))
-
-if __name__ == "__main__":
-    load_dotenv()
-    try:
-        asyncio.run(main())
-    except Exception as e:
-        logger.error(f"Error in main: {e}")
+import discord
+from discord import app_commands
+from discord.ext import commands
+import json
+import os
+from dotenv import load_dotenv
+from aiohttp import web
+import aiohttp
+import asyncio
+from datetime import datetime, timedelta
+import secrets
+import time
+from typing import Dict, List, Optional
+import logging
+import zlib
+from storage import CodeIndex, open_link_store
+from roblox_api import CACHE_FRESH, CACHE_STALE, CacheSnapshotter, LookupCache, MicroBatcher, SingleFlight, TokenBucketLimiter, parse_retry_after
+from role_sync import RoleSyncScheduler
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+intents = discord.Intents.default()
+intents.message_content = True
+bot = commands.Bot(command_prefix="!", intents=intents)
+
+linked_accounts_file = "linked_accounts.json"
+linked_accounts_journal_file = "linked_accounts.journal.jsonl"
+linked_accounts_db_file = "linked_accounts.db"
+role_sync_state_file = "role_sync_state.json"
+roblox_cache_file = "roblox_cache.json"
+CONFIG_FILE = "config.json"
+ADMIN_ROLE_NAME = "Admin"
+SUPPORTER_ROLE_NAME = "Supporter"
+OWNER_ID = 1322627642746339432
+ROBLOX_USERS_API = os.getenv("ROBLOX_USERS_API", "https://users.roblox.com")
+ROBLOX_INVENTORY_API = os.getenv("ROBLOX_INVENTORY_API", "https://inventory.roblox.com")
+ROBLOX_USERNAMES_URL = ROBLOX_USERS_API + "/v1/usernames/users"
+ROBLOX_API_URL = ROBLOX_INVENTORY_API + "/v1/users/{user_id}/items/GamePass/{gamepass_id}"
+# Paginated listing of a user's gamepasses (asset type 34); fails for private inventories
+ROBLOX_INVENTORY_LIST_URL = ROBLOX_INVENTORY_API + "/v2/users/{user_id}/inventory/34"
+REDEEM_URL = "/redeem"
+DOWNLOAD_URL = "/download"
+ZIP_FILE_PATH = "secure_downloads/app.zip"
+
+# Configurable download base URL (set in .env or fallback to Render)
+DOWNLOAD_BASE_URL = os.getenv("DOWNLOAD_BASE_URL", f"https://{os.environ.get('RENDER_EXTERNAL_HOSTNAME', 'linker-for-dc.onrender.com')}")
+
+# Rate limiting and caching
+cache_expiry = int(os.getenv("ROBLOX_CACHE_TTL", 300))
+# Unknown usernames are remembered for a shorter time; fresh answers may be served stale for
+# ROBLOX_CACHE_STALE_TTL more seconds while a background refresh runs
+ROBLOX_NEGATIVE_CACHE_TTL = int(os.getenv("ROBLOX_NEGATIVE_CACHE_TTL", 60))
+ROBLOX_CACHE_STALE_TTL = int(os.getenv("ROBLOX_CACHE_STALE_TTL", 600))
+ROBLOX_CACHE_MAX_ENTRIES = int(os.getenv("ROBLOX_CACHE_MAX_ENTRIES", 50000))
+roblox_cache = LookupCache(ROBLOX_CACHE_MAX_ENTRIES, cache_expiry, ROBLOX_NEGATIVE_CACHE_TTL, ROBLOX_CACHE_STALE_TTL)
+# Snapshot roblox_cache to disk so a restart starts warm; loaded in the background on startup
+ROBLOX_CACHE_SNAPSHOT_INTERVAL = int(os.getenv("ROBLOX_CACHE_SNAPSHOT_INTERVAL", 300))
+roblox_cache_snapshots = CacheSnapshotter(roblox_cache, roblox_cache_file, ROBLOX_CACHE_SNAPSHOT_INTERVAL)
+# Identical lookups already in flight (same cache key) share one upstream request
+roblox_flights = SingleFlight()
+
+# Per-host token buckets for the Roblox API: sustained requests/second, burst size and in-flight cap
+ROBLOX_USERS_RATE = float(os.getenv("ROBLOX_USERS_RATE", 1.0))
+ROBLOX_USERS_BURST = int(os.getenv("ROBLOX_USERS_BURST", 3))
+ROBLOX_INVENTORY_RATE = float(os.getenv("ROBLOX_INVENTORY_RATE", 3.0))
+ROBLOX_INVENTORY_BURST = int(os.getenv("ROBLOX_INVENTORY_BURST", 6))
+ROBLOX_MAX_IN_FLIGHT = int(os.getenv("ROBLOX_MAX_IN_FLIGHT", 8))
+ROBLOX_MAX_ATTEMPTS = int(os.getenv("ROBLOX_MAX_ATTEMPTS", 5))
+roblox_limiters = {
+    "users": TokenBucketLimiter("users", ROBLOX_USERS_RATE, ROBLOX_USERS_BURST, ROBLOX_MAX_IN_FLIGHT),
+    "inventory": TokenBucketLimiter("inventory", ROBLOX_INVENTORY_RATE, ROBLOX_INVENTORY_BURST, ROBLOX_MAX_IN_FLIGHT)
+}
+
+# Shared HTTP session for Roblox API calls (keep-alive, pooled connections, cached DNS)
+http_session: Optional[aiohttp.ClientSession] = None
+ROBLOX_MAX_CONNECTIONS = int(os.getenv("ROBLOX_MAX_CONNECTIONS", 100))
+ROBLOX_MAX_CONNECTIONS_PER_HOST = int(os.getenv("ROBLOX_MAX_CONNECTIONS_PER_HOST", 20))
+ROBLOX_KEEPALIVE_TIMEOUT = float(os.getenv("ROBLOX_KEEPALIVE_TIMEOUT", 60))
+ROBLOX_DNS_CACHE_TTL = int(os.getenv("ROBLOX_DNS_CACHE_TTL", 300))
+ROBLOX_TIMEOUTS = {
+    "users": aiohttp.ClientTimeout(total=float(os.getenv("ROBLOX_USERS_TIMEOUT", 10)), connect=float(os.getenv("ROBLOX_CONNECT_TIMEOUT", 5))),
+    "inventory": aiohttp.ClientTimeout(total=float(os.getenv("ROBLOX_INVENTORY_TIMEOUT", 10)), connect=float(os.getenv("ROBLOX_CONNECT_TIMEOUT", 5)))
+}
+
+# Username lookups arriving within ROBLOX_BATCH_WINDOW_MS share one POST to the usernames endpoint
+ROBLOX_BATCH_WINDOW_MS = int(os.getenv("ROBLOX_BATCH_WINDOW_MS", 50))
+ROBLOX_BATCH_MAX = int(os.getenv("ROBLOX_BATCH_MAX", 100))
+
+# Per-gamepass fallback checks (private inventories) run at most this many at once; the Roblox limiters still apply
+CLAIM_ROLES_CONCURRENCY = int(os.getenv("CLAIM_ROLES_CONCURRENCY", 8))
+# Inventory pages to walk before falling back to per-gamepass checks for whatever is still unresolved
+ROBLOX_INVENTORY_MAX_PAGES = int(os.getenv("ROBLOX_INVENTORY_MAX_PAGES", 5))
+
+# In-memory storage for pending codes, indexed by discord_id for invalidation
+pending_codes: Dict[str, Dict] = {}
+pending_code_index = CodeIndex()
+
+# Expired pending and generated codes are swept every CODE_SWEEP_INTERVAL seconds, persisted
+# as one journal record (or transaction) per CODE_SWEEP_BATCH codes
+CODE_SWEEP_INTERVAL = int(os.getenv("CODE_SWEEP_INTERVAL", 30))
+CODE_SWEEP_BATCH = int(os.getenv("CODE_SWEEP_BATCH", 500))
+code_expiry_stats = {
+    "sweeps": 0,
+    "pending_expired": 0,
+    "generated_expired": 0,
+    "last_sweep_ms": 0.0,
+}
+
+# Storage backend for linked accounts: "json" (snapshot + journal) or "sqlite" (WAL, indexed).
+# Switching to sqlite imports linked_accounts.json once on first start.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+
+# Write-behind persistence: flush at most every SAVE_FLUSH_INTERVAL_MS, or sooner after SAVE_MAX_PENDING changes
+SAVE_FLUSH_INTERVAL_MS = int(os.getenv("SAVE_FLUSH_INTERVAL_MS", 500))
+SAVE_MAX_PENDING = int(os.getenv("SAVE_MAX_PENDING", 100))
+# Journal compaction: fold the journal into linked_accounts.json after this many records or seconds
+JOURNAL_COMPACT_RECORDS = int(os.getenv("JOURNAL_COMPACT_RECORDS", 10000))
+JOURNAL_COMPACT_INTERVAL = int(os.getenv("JOURNAL_COMPACT_INTERVAL", 3600))
+
+# Background role sync: re-check every linked user once per ROLE_SYNC_CYCLE_HOURS (users active within
+# ROLE_SYNC_ACTIVE_HOURS ROLE_SYNC_ACTIVE_SPEEDUP times as often), checking at most
+# ROLE_SYNC_BUDGET_PER_MINUTE users per minute in batches every ROLE_SYNC_TICK_SECONDS
+ROLE_SYNC_ENABLED = os.getenv("ROLE_SYNC_ENABLED", "true").lower() == "true"
+ROLE_SYNC_CYCLE_HOURS = float(os.getenv("ROLE_SYNC_CYCLE_HOURS", 24))
+ROLE_SYNC_TICK_SECONDS = float(os.getenv("ROLE_SYNC_TICK_SECONDS", 30))
+ROLE_SYNC_BUDGET_PER_MINUTE = float(os.getenv("ROLE_SYNC_BUDGET_PER_MINUTE", 90))
+ROLE_SYNC_ACTIVE_HOURS = float(os.getenv("ROLE_SYNC_ACTIVE_HOURS", 24))
+ROLE_SYNC_ACTIVE_SPEEDUP = float(os.getenv("ROLE_SYNC_ACTIVE_SPEEDUP", 4))
+ROLE_SYNC_CHECKPOINT_SECONDS = float(os.getenv("ROLE_SYNC_CHECKPOINT_SECONDS", 300))
+
+# ------------------- Load Config & Accounts -------------------
+
+try:
+    with open(CONFIG_FILE, "r") as f:
+        config = json.load(f)
+except FileNotFoundError:
+    config = {"gamepass_roles": []}
+
+link_store = open_link_store(
+    STORAGE_BACKEND,
+    linked_accounts_file,
+    linked_accounts_journal_file,
+    linked_accounts_db_file,
+    flush_interval=SAVE_FLUSH_INTERVAL_MS / 1000,
+    max_pending=SAVE_MAX_PENDING,
+    compact_records=JOURNAL_COMPACT_RECORDS,
+    compact_interval=JOURNAL_COMPACT_INTERVAL
+)
+
+def is_admin(interaction: discord.Interaction) -> bool:
+    try:
+        role = discord.utils.get(interaction.guild.roles, name=ADMIN_ROLE_NAME)
+        if role is None:
+            logger.warning(f"Admin role '{ADMIN_ROLE_NAME}' not found in guild {interaction.guild.id}")
+            return False
+        return (role in interaction.user.roles) or (interaction.user.id == OWNER_ID)
+    except AttributeError:
+        logger.warning(f"No guild context for admin check in interaction {interaction.id}")
+        return False
+
+def has_supporter_role(member: discord.Member) -> bool:
+    try:
+        if not member.guild:
+            logger.warning(f"No guild context for member {member.id}")
+            return False
+        role = discord.utils.get(member.guild.roles, name=SUPPORTER_ROLE_NAME)
+        if role is None:
+            logger.warning(f"Supporter role '{SUPPORTER_ROLE_NAME}' not found in guild {member.guild.id}")
+            return False
+        return role in member.roles
+    except AttributeError:
+        logger.warning(f"Invalid member object for supporter role check: {member.id}")
+        return False
+
+# ------------------- Rate Limited API Calls -------------------
+
+def create_http_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=ROBLOX_MAX_CONNECTIONS,
+        limit_per_host=ROBLOX_MAX_CONNECTIONS_PER_HOST,
+        keepalive_timeout=ROBLOX_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=ROBLOX_DNS_CACHE_TTL
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+def get_http_session() -> aiohttp.ClientSession:
+    # Created once in main(); lazily here too so helpers work outside the bot (scripts, benchmarks)
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = create_http_session()
+    return http_session
+
+async def close_http_session():
+    global http_session
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+    http_session = None
+
+def roblox_limiter_stats() -> Dict[str, Dict]:
+    return {
+        name: {**limiter.stats, "queue_depth": limiter.queue_depth, "in_flight": limiter.in_flight, "rate": limiter.rate}
+        for name, limiter in roblox_limiters.items()
+    }
+
+async def get_roblox_user_id(username: str) -> Optional[int]:
+    cache_key = f"user_{username}"
+    state, cached = roblox_cache.get(cache_key)
+    if state == CACHE_FRESH:
+        return cached
+    if state == CACHE_STALE:
+        roblox_cache.refresh_in_background(cache_key, lambda: roblox_flights.do(cache_key, lambda: username_batcher.submit(username)))
+        return cached
+
+    try:
+        return await roblox_flights.do(cache_key, lambda: username_batcher.submit(username))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error in get_roblox_user_id: {e}")
+    return None
+
+async def fetch_roblox_user_ids(usernames: List[str]) -> Dict[str, Optional[int]]:
+    limiter = roblox_limiters["users"]
+    session = get_http_session()
+    for attempt in range(ROBLOX_MAX_ATTEMPTS):
+        async with limiter:
+            async with session.post(ROBLOX_USERNAMES_URL, json={"usernames": usernames}, timeout=ROBLOX_TIMEOUTS["users"]) as response:
+                if response.status == 429:
+                    # The limiter holds back every caller on this host until Retry-After passes
+                    limiter.penalize(parse_retry_after(response.headers.get("Retry-After")))
+                    continue
+                limiter.record_success()
+                if response.status != 200:
+                    return {}
+                user_data = await response.json()
+        # Roblox matches usernames case-insensitively and echoes what we asked for
+        found = {entry["requestedUsername"].lower(): entry["id"] for entry in user_data["data"]}
+        results = {}
+        for username in usernames:
+            user_id = found.get(username.lower())
+            results[username] = user_id
+            # Misses are cached too (negative TTL), so repeated typos don't reach the API
+            roblox_cache.set(f"user_{username}", user_id)
+        logger.info(f"Resolved {len(found)}/{len(usernames)} usernames in one batch")
+        return results
+    logger.warning(f"Giving up on {len(usernames)} username lookups after {ROBLOX_MAX_ATTEMPTS} throttled attempts")
+    return {}
+
+username_batcher = MicroBatcher(fetch_roblox_user_ids, window=ROBLOX_BATCH_WINDOW_MS / 1000, max_batch=ROBLOX_BATCH_MAX)
+
+async def has_gamepass(user_id: int, gamepass_id: int) -> bool:
+    # A fresh per-user ownership record answers for every configured gamepass
+    ids = configured_gamepass_ids()
+    if gamepass_id in ids:
+        state, mask = roblox_cache.peek(ownership_cache_key(user_id, ids))
+        if state == CACHE_FRESH:
+            return decode_ownership(mask, ids)[gamepass_id]
+
+    cache_key = f"gamepass_{user_id}_{gamepass_id}"
+    state, cached = roblox_cache.get(cache_key)
+    if state == CACHE_FRESH:
+        return cached
+    if state == CACHE_STALE:
+        roblox_cache.refresh_in_background(cache_key, lambda: roblox_flights.do(cache_key, lambda: fetch_gamepass_ownership(user_id, gamepass_id)))
+        return cached
+
+    try:
+        has_pass = await roblox_flights.do(cache_key, lambda: fetch_gamepass_ownership(user_id, gamepass_id))
+        if has_pass is not None:
+            return has_pass
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error in has_gamepass: {e}")
+    return False
+
+async def fetch_gamepass_ownership(user_id: int, gamepass_id: int) -> Optional[bool]:
+    # None means no definitive answer (throttled out or an unexpected status); nothing is cached then
+    url = ROBLOX_API_URL.format(user_id=user_id, gamepass_id=gamepass_id)
+    limiter = roblox_limiters["inventory"]
+    session = get_http_session()
+    for attempt in range(ROBLOX_MAX_ATTEMPTS):
+        async with limiter:
+            async with session.get(url, timeout=ROBLOX_TIMEOUTS["inventory"]) as response:
+                if response.status == 429:
+                    limiter.penalize(parse_retry_after(response.headers.get("Retry-After")))
+                    continue
+                limiter.record_success()
+                if response.status != 200:
+                    return None
+                gamepasses = await response.json()
+        has_pass = bool(gamepasses.get("data", []))
+        roblox_cache.set(f"gamepass_{user_id}_{gamepass_id}", has_pass)
+        return has_pass
+    logger.warning(f"Giving up on gamepass {gamepass_id} for user {user_id} after {ROBLOX_MAX_ATTEMPTS} throttled attempts")
+    return None
+
+# ------------------- Gamepass Ownership -------------------
+
+def configured_gamepass_ids() -> List[int]:
+    return sorted({mapping["gamepass_id"] for mapping in config["gamepass_roles"]})
+
+def ownership_cache_key(user_id: int, ids: List[int]) -> str:
+    # Keyed to the configured gamepass set, so editing config.json invalidates old records
+    config_version = zlib.crc32(",".join(map(str, ids)).encode())
+    return f"ownership_{user_id}_{config_version:08x}"
+
+def encode_ownership(owned: Dict[int, bool], ids: List[int]) -> int:
+    return sum(1 << index for index, gamepass_id in enumerate(ids) if owned.get(gamepass_id))
+
+def decode_ownership(mask: int, ids: List[int]) -> Dict[int, bool]:
+    return {gamepass_id: bool(mask >> index & 1) for index, gamepass_id in enumerate(ids)}
+
+async def get_gamepass_ownership(user_id: int) -> Dict[int, bool]:
+    ownership = await lookup_gamepass_ownership(user_id)
+    if ownership is None:
+        return {gamepass_id: False for gamepass_id in configured_gamepass_ids()}
+    return ownership
+
+async def lookup_gamepass_ownership(user_id: int) -> Optional[Dict[int, bool]]:
+    # Ownership of every configured gamepass, cached as one bitmask per user; None if Roblox gave no answer
+    ids = configured_gamepass_ids()
+    cache_key = ownership_cache_key(user_id, ids)
+    state, cached = roblox_cache.get(cache_key)
+    if state == CACHE_FRESH:
+        return decode_ownership(cached, ids)
+    if state == CACHE_STALE:
+        roblox_cache.refresh_in_background(cache_key, lambda: roblox_flights.do(cache_key, lambda: fetch_all_gamepass_ownership(user_id, ids)))
+        return decode_ownership(cached, ids)
+
+    try:
+        mask = await roblox_flights.do(cache_key, lambda: fetch_all_gamepass_ownership(user_id, ids))
+        if mask is not None:
+            return decode_ownership(mask, ids)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error in lookup_gamepass_ownership: {e}")
+    return None
+
+async def fetch_all_gamepass_ownership(user_id: int, ids: List[int]) -> Optional[int]:
+    owned = await list_owned_gamepasses(user_id, set(ids))
+    if owned is None:
+        unresolved = ids
+        owned = {}
+    else:
+        unresolved = [gamepass_id for gamepass_id in ids if gamepass_id not in owned]
+    if unresolved:
+        # Private inventory or more pages than we walk: check the rest one by one
+        semaphore = asyncio.Semaphore(CLAIM_ROLES_CONCURRENCY)
+
+        async def check(gamepass_id: int) -> Optional[bool]:
+            async with semaphore:
+                return await fetch_gamepass_ownership(user_id, gamepass_id)
+
+        answers = await asyncio.gather(*(check(gamepass_id) for gamepass_id in unresolved))
+        if any(answer is None for answer in answers):
+            return None
+        owned.update(zip(unresolved, answers))
+    mask = encode_ownership(owned, ids)
+    roblox_cache.set(ownership_cache_key(user_id, ids), mask)
+    return mask
+
+async def list_owned_gamepasses(user_id: int, wanted: set) -> Optional[Dict[int, bool]]:
+    # Walks the inventory listing until every wanted gamepass is seen or the listing ends.
+    # Returns None when the listing is unavailable; ids missing from a partial walk are left out.
+    url = ROBLOX_INVENTORY_LIST_URL.format(user_id=user_id)
+    limiter = roblox_limiters["inventory"]
+    session = get_http_session()
+    found = set()
+    cursor = ""
+    for page in range(ROBLOX_INVENTORY_MAX_PAGES):
+        params = {"limit": 100, "sortOrder": "Asc"}
+        if cursor:
+            params["cursor"] = cursor
+        for attempt in range(ROBLOX_MAX_ATTEMPTS):
+            async with limiter:
+                async with session.get(url, params=params, timeout=ROBLOX_TIMEOUTS["inventory"]) as response:
+                    if response.status == 429:
+                        limiter.penalize(parse_retry_after(response.headers.get("Retry-After")))
+                        continue
+                    limiter.record_success()
+                    if response.status != 200:
+                        return None
+                    listing = await response.json()
+            break
+        else:
+            return None
+        for item in listing.get("data", []):
+            item_id = item.get("assetId", item.get("id"))
+            if item_id in wanted:
+                found.add(item_id)
+        cursor = listing.get("nextPageCursor")
+        if found == wanted or not cursor:
+            # Either everything is accounted for or the listing is complete
+            return {gamepass_id: gamepass_id in found for gamepass_id in wanted}
+    return {gamepass_id: True for gamepass_id in found}
+
+# ------------------- Code Verification -------------------
+
+def add_pending_code(code: str, code_data: Dict):
+    remove_pending_code(code)
+    pending_codes[code] = code_data
+    pending_code_index.add(code, code_data)
+
+def remove_pending_code(code: str):
+    code_data = pending_codes.pop(code, None)
+    if code_data is not None:
+        pending_code_index.remove(code, code_data)
+
+async def verify_code_internal(code: str, discord_id: str) -> Optional[str]:
+    try:
+        if code not in pending_codes:
+            logger.warning(f"Code {code} not found in pending_codes for discord_id {discord_id}")
+            return None
+        code_data = pending_codes[code]
+        if code_data["discord_id"] != discord_id:
+            logger.warning(f"Code {code} does not match discord_id {discord_id}")
+            return None
+        if time.time() > code_data["expiry"]:
+            logger.warning(f"Code {code} expired for discord_id {discord_id}")
+            remove_pending_code(code)
+            return None
+        download_token = code_data["download_token"]
+        
+        # Persist to the link store
+        link_store.apply("code_verified", code=code, discord_id=discord_id, expiry=code_data["expiry"], download_token=download_token)
+        remove_pending_code(code)
+        logger.info(f"Code {code} verified and stored for discord_id {discord_id}")
+        return download_token
+    except Exception as e:
+        logger.error(f"Error in verify_code_internal for code {code}, discord_id {discord_id}: {str(e)}")
+        return None
+
+async def invalidate_user_codes(discord_id: str):
+    try:
+        # Remove from pending_codes
+        for code in pending_code_index.codes_for_user(discord_id):
+            remove_pending_code(code)
+            logger.info(f"Removed pending code {code} for discord_id {discord_id}")
+        # Remove from the link store
+        link_store.apply("device_unlinked", discord_id=discord_id)
+        logger.info(f"Invalidated codes for discord_id {discord_id}")
+    except Exception as e:
+        logger.error(f"Error in invalidate_user_codes for discord_id {discord_id}: {e}")
+
+# ------------------- Code Expiry -------------------
+
+async def sweep_expired_codes(now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    start = time.perf_counter()
+    expired_pending = pending_code_index.expired_codes(now)
+    for code in expired_pending:
+        remove_pending_code(code)
+    expired_generated = 0
+    while True:
+        codes = link_store.expired_codes(now, CODE_SWEEP_BATCH)
+        if not codes:
+            break
+        link_store.apply("codes_expired", codes=codes)
+        expired_generated += len(codes)
+        if len(codes) < CODE_SWEEP_BATCH:
+            break
+        await asyncio.sleep(0)  # Let other work run between batches of a large backlog
+    code_expiry_stats["sweeps"] += 1
+    code_expiry_stats["pending_expired"] += len(expired_pending)
+    code_expiry_stats["generated_expired"] += expired_generated
+    code_expiry_stats["last_sweep_ms"] = (time.perf_counter() - start) * 1000
+    if expired_pending or expired_generated:
+        logger.info(f"Expired {len(expired_pending)} pending and {expired_generated} generated codes")
+    return len(expired_pending) + expired_generated
+
+def code_counts() -> Dict[str, int]:
+    # Live counts include codes that expired since the last sweep
+    return {
+        "pending_live": len(pending_codes),
+        "pending_expired": code_expiry_stats["pending_expired"],
+        "generated_live": link_store.count_codes(),
+        "generated_expired": code_expiry_stats["generated_expired"]
+    }
+
+async def run_code_sweeper():
+    while True:
+        try:
+            await sweep_expired_codes()
+        except Exception as e:
+            logger.error(f"Error in sweep_expired_codes: {e}")
+        await asyncio.sleep(CODE_SWEEP_INTERVAL)
+
+# ------------------- Discord Bot Commands -------------------
+
+@bot.tree.command(name="link-account", description="Link your account to download the application (Supporter role required).")
+async def link_account(interaction: discord.Interaction):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for link-account, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if not has_supporter_role(interaction.user):
+            embed.title = "❌ Permission Denied"
+            embed.description = f"You need the '{SUPPORTER_ROLE_NAME}' role in this server to use this command."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"link-account denied for discord_id {discord_id}: no Supporter role")
+            return
+
+        if link_store.has_linked_device(discord_id):
+            embed.title = "❌ Already Linked"
+            embed.description = "Your account is already linked to a device. Use `/change-account` to link a new device."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"link-account denied for discord_id {discord_id}: already linked")
+            return
+
+        embed.title = "✅ Ready to Generate Code"
+        embed.description = "Run the terminal application to generate a verification code. Then use `/verify-code <code>` to receive a token."
+        embed.color = discord.Color.green()
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"link-account called by discord_id {discord_id} in guild {interaction.guild.id}")
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in link_account for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in link_account for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in link_account for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="verify-code", description="Verify your code to receive a token (Supporter role required).")
+async def verify_code(interaction: discord.Interaction, code: str):
+    discord_id = str(interaction.user.id)
+    try:
+        await interaction.response.defer(ephemeral=True)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for verify-code, discord_id {discord_id}, code {code}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if not interaction.guild:
+            embed.title = "❌ Invalid Context"
+            embed.description = "This command must be run in a server."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"verify-code denied for discord_id {discord_id}: no guild context")
+            return
+
+        if not has_supporter_role(interaction.user):
+            embed.title = "❌ Permission Denied"
+            embed.description = f"You need the '{SUPPORTER_ROLE_NAME}' role in this server to use this command."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"verify-code denied for discord_id {discord_id}: no Supporter role")
+            return
+
+        logger.info(f"Attempting to verify code {code} for discord_id {discord_id}")
+        download_token = await verify_code_internal(code, discord_id)
+        if not download_token:
+            embed.title = "❌ Invalid or Expired Code"
+            embed.description = "The code is invalid or has expired. Run the terminal app to generate a new code and try again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"verify-code failed for discord_id {discord_id}: invalid or expired code {code}")
+            return
+
+        embed.title = "✅ Code Verified"
+        embed.description = f"Your token is: `{download_token}`\nUse this token in the terminal application to download and run the application."
+        embed.color = discord.Color.green()
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"verify-code successful for discord_id {discord_id}, code {code} in guild {interaction.guild.id}")
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in verify_code for discord_id {discord_id}, code {code}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in verify_code for discord_id {discord_id}, code {code}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in verify_code for discord_id {discord_id}, code {code}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred while verifying the code. Please try again or contact an admin.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="change-account", description="Unlink your current device and link a new one (Supporter role required).")
+async def change_account(interaction: discord.Interaction):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for change-account, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if not has_supporter_role(interaction.user):
+            embed.title = "❌ Permission Denied"
+            embed.description = f"You need the '{SUPPORTER_ROLE_NAME}' role in this server to use this command."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"change-account denied for discord_id {discord_id}: no Supporter role")
+            return
+
+        if not link_store.has_linked_device(discord_id):
+            embed.title = "❌ No Device Linked"
+            embed.description = "You haven't linked a device yet. Use `/link-account` to start the process."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"change-account denied for discord_id {discord_id}: no device linked")
+            return
+
+        await invalidate_user_codes(discord_id)
+        embed.title = "✅ Device Unlinked"
+        embed.description = "Your previous device link has been removed. Run the terminal app to generate a new verification code and use `/verify-code`."
+        embed.color = discord.Color.green()
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"change-account successful for discord_id {discord_id} in guild {interaction.guild.id}")
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in change_account for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in change_account for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in change_account for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="link-roblox", description="Link your Roblox account to your Discord account.")
+async def link_roblox(interaction: discord.Interaction, username: str):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for link-roblox, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        user_id = await get_roblox_user_id(username)
+        if not user_id:
+            embed.title = "❌ User Not Found"
+            embed.description = f"Could not find a Roblox user with the username: `{username}`"
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        roblox_id_str = str(user_id)
+
+        if link_store.get_roblox_id(discord_id) is not None:
+            embed.title = "❌ Already Linked"
+            embed.description = "Your Discord account is already linked to a Roblox account."
+            embed.color = discord.Color.red()
+        elif link_store.get_discord_id(roblox_id_str) is not None:
+            embed.title = "❌ Already Linked"
+            embed.description = "This Roblox account is already linked to another Discord user."
+            embed.color = discord.Color.red()
+        else:
+            link_store.apply("link", discord_id=discord_id, roblox_id=user_id)
+            embed.title = "✅ Account Linked"
+            embed.description = f"Successfully linked to Roblox account: `{username}`"
+            embed.color = discord.Color.green()
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"link-roblox called by discord_id {discord_id}, username {username}")
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in link_roblox for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in link_roblox for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in link_roblox for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="unlink-roblox", description="Unlink your Roblox account from your Discord account.")
+async def unlink_roblox(interaction: discord.Interaction):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for unlink-roblox, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if link_store.is_force_linked(discord_id):
+            embed.title = "❌ Cannot Unlink"
+            embed.description = "This account was force-linked by an admin and cannot be unlinked."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if link_store.get_roblox_id(discord_id) is not None:
+            await remove_gamepass_roles(interaction.user)
+            link_store.apply("unlink", discord_id=discord_id)
+
+            embed.title = "✅ Account Unlinked"
+            embed.color = discord.Color.green()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"unlink-roblox successful for discord_id {discord_id}")
+        else:
+            embed.title = "❌ No Account Linked"
+            embed.description = "You don't have any Roblox account linked."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in unlink_roblox for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in unlink_roblox for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in unlink_roblox for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="claim-roles", description="Claim your roles based on your Roblox gamepasses.")
+async def claim_roles(interaction: discord.Interaction):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for claim-roles, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        roblox_id = link_store.get_roblox_id(discord_id)
+        if roblox_id is None:
+            embed.title = "❌ Not Linked"
+            embed.description = "You need to link your Roblox account first using `/link-roblox`!"
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        results = await claim_gamepass_roles(interaction.user, roblox_id)
+        added_roles = [result["description"] for result in results if result["status"] == "added"]
+        lines = [CLAIM_STATUS_LINES[result["status"]].format(description=result["description"]) for result in results if result["status"] != "role_missing"]
+
+        embed.title = "🎮 Role Claim"
+        if added_roles:
+            embed.description = "✅ Successfully claimed your roles!"
+            embed.color = discord.Color.green()
+        else:
+            embed.description = "ℹ️ You have no new roles to claim."
+            embed.color = discord.Color.blue()
+        if lines:
+            embed.description += "\n\n" + "\n".join(lines)
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"claim-roles called by discord_id {discord_id}")
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in claim_roles for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in claim_roles for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in claim_roles for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="list-linked", description="(Admin) List all linked accounts.")
+@app_commands.checks.has_role(ADMIN_ROLE_NAME)
+async def list_linked(interaction: discord.Interaction):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for list-linked, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if not is_admin(interaction):
+            embed.title = "❌ Permission Denied"
+            embed.description = "You do not have permission to use this command."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"list-linked denied for discord_id {discord_id}: not admin")
+            return
+
+        description = ""
+        for discord_id, roblox_id in link_store.iter_links():
+            description += f"<@{discord_id}> ➜ `{roblox_id}`\n"
+
+        embed.title = "🔗 Linked Accounts"
+        embed.description = description or "None found."
+        embed.color = discord.Color.blue()
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"list-linked called by discord_id {discord_id}")
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in list_linked for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in list_linked for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in list_linked for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="force-link", description="(Admin) Force link a user to a Roblox username.")
+@app_commands.checks.has_role(ADMIN_ROLE_NAME)
+async def force_link(interaction: discord.Interaction, discord_user: discord.User, roblox_username: str):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        target_discord_id = str(discord_user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for force-link, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if not is_admin(interaction):
+            embed.title = "❌ Permission Denied"
+            embed.description = "You do not have permission to use this command."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"force-link denied for discord_id {discord_id}: not admin")
+            return
+
+        user_id = await get_roblox_user_id(roblox_username)
+        if not user_id:
+            embed.title = "❌ Roblox User Not Found"
+            embed.description = f"Could not find a Roblox user with the username: `{roblox_username}`"
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        link_store.apply("force_link", discord_id=target_discord_id, roblox_id=user_id)
+        embed.title = "✅ Force Linked"
+        embed.description = f"Successfully linked {discord_user.mention} to `{roblox_username}`"
+        embed.color = discord.Color.green()
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        logger.info(f"force-link called by discord_id {discord_id}, linked {target_discord_id} to {roblox_username}")
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in force_link for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in force_link for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in force_link for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+@bot.tree.command(name="admin-unlink", description="(Admin) Unlink a user manually.")
+@app_commands.checks.has_role(ADMIN_ROLE_NAME)
+async def admin_unlink(interaction: discord.Interaction, discord_user: discord.User):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        discord_id = str(interaction.user.id)
+        target_discord_id = str(discord_user.id)
+        embed = discord.Embed(color=discord.Color.blue())
+
+        if interaction.is_expired():
+            logger.warning(f"Interaction expired for admin-unlink, discord_id {discord_id}")
+            embed.title = "❌ Interaction Expired"
+            embed.description = "This interaction has timed out. Please try the command again."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        if not is_admin(interaction):
+            embed.title = "❌ Permission Denied"
+            embed.description = "You do not have permission to use this command."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"admin-unlink denied for discord_id {discord_id}: not admin")
+            return
+
+        if link_store.get_roblox_id(target_discord_id) is not None:
+            link_store.apply("unlink", discord_id=target_discord_id)
+            embed.title = "✅ Unlinked"
+            embed.description = f"Successfully unlinked {discord_user.mention}"
+            embed.color = discord.Color.green()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            logger.info(f"admin-unlink successful for discord_id {target_discord_id}")
+        else:
+            embed.title = "❌ User Not Linked"
+            embed.description = "This user is not linked to any Roblox account."
+            embed.color = discord.Color.red()
+            await interaction.followup.send(embed=embed, ephemeral=True)
+    except discord.errors.NotFound as e:
+        logger.error(f"NotFound in admin_unlink for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction not found. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except discord.errors.HTTPException as e:
+        logger.error(f"HTTPException in admin_unlink for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="Interaction already acknowledged. Please try again.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+    except Exception as e:
+        logger.error(f"Error in admin-unlink for discord_id {discord_id}: {str(e)}")
+        try:
+            embed = discord.Embed(title="❌ Error", description="An error occurred. Please try again later.", color=discord.Color.red())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        except:
+            pass
+
+# ------------------- Helper Functions -------------------
+
+async def remove_gamepass_roles(member: discord.Member):
+    try:
+        role_ids = [mapping["role_id"] for mapping in config["gamepass_roles"]]
+        roles_to_remove = [role for role in member.roles if role.id in role_ids]
+        if roles_to_remove:
+            await member.remove_roles(*roles_to_remove)
+            logger.info(f"Removed gamepass roles from {member.id}")
+    except Exception as e:
+        logger.error(f"Error in remove_gamepass_roles for member {member.id}: {e}")
+
+CLAIM_STATUS_LINES = {
+    "added": "✅ {description}",
+    "already_has": "☑️ {description} (already claimed)",
+    "not_owned": "❌ {description} (gamepass not owned)"
+}
+
+async def check_gamepass_roles(member: discord.Member, roblox_id: int) -> List[Dict]:
+    # Resolve ownership of every configured gamepass once, then match it against the member's roles
+    member_role_ids = {role.id for role in member.roles}
+    results = []
+    for mapping in config["gamepass_roles"]:
+        result = {"description": mapping["description"], "gamepass_id": mapping["gamepass_id"], "role": member.guild.get_role(mapping["role_id"])}
+        if result["role"] is None:
+            logger.warning(f"Role {mapping['role_id']} for gamepass {mapping['gamepass_id']} not found in guild {member.guild.id}")
+            result["status"] = "role_missing"
+        elif result["role"].id in member_role_ids:
+            result["status"] = "already_has"
+        else:
+            result["status"] = "unchecked"
+        results.append(result)
+
+    if any(result["status"] == "unchecked" for result in results):
+        ownership = await get_gamepass_ownership(roblox_id)
+        for result in results:
+            if result["status"] == "unchecked":
+                result["status"] = "earned" if ownership.get(result["gamepass_id"]) else "not_owned"
+    return results
+
+async def claim_gamepass_roles(member: discord.Member, roblox_id: int) -> List[Dict]:
+    results = await check_gamepass_roles(member, roblox_id)
+    earned = [result for result in results if result["status"] == "earned"]
+    if earned:
+        # One Discord call for every earned role instead of one per role
+        await member.add_roles(*(result["role"] for result in earned), reason="Gamepass roles claimed")
+        for result in earned:
+            result["status"] = "added"
+        logger.info(f"Added {len(earned)} gamepass roles to {member.id}")
+    return results
+
+async def sync_gamepass_roles(member: discord.Member, roblox_id: int) -> Optional[bool]:
+    # Add and revoke mapped roles so they match current ownership. Returns whether anything
+    # changed, or None when ownership could not be determined (nothing is revoked then).
+    ownership = await lookup_gamepass_ownership(roblox_id)
+    if ownership is None:
+        return None
+    managed_role_ids = {mapping["role_id"] for mapping in config["gamepass_roles"]}
+    earned_role_ids = {mapping["role_id"] for mapping in config["gamepass_roles"] if ownership.get(mapping["gamepass_id"])}
+    member_role_ids = {role.id for role in member.roles}
+    roles_to_add = [role for role in (member.guild.get_role(role_id) for role_id in earned_role_ids - member_role_ids) if role is not None]
+    roles_to_remove = [role for role in member.roles if role.id in managed_role_ids - earned_role_ids]
+    if roles_to_add:
+        await member.add_roles(*roles_to_add, reason="Gamepass role sync")
+    if roles_to_remove:
+        await member.remove_roles(*roles_to_remove, reason="Gamepass role sync: gamepass no longer owned")
+    if roles_to_add or roles_to_remove:
+        logger.info(f"Role sync for {member.id}: added {len(roles_to_add)}, removed {len(roles_to_remove)}")
+    return bool(roles_to_add or roles_to_remove)
+
+async def sync_linked_user(discord_id: str, roblox_id: int) -> Optional[bool]:
+    if not config["gamepass_roles"]:
+        return False
+    changed = False
+    for guild in bot.guilds:
+        member = guild.get_member(int(discord_id))
+        if member is None:
+            try:
+                member = await guild.fetch_member(int(discord_id))
+            except discord.errors.NotFound:
+                continue
+        result = await sync_gamepass_roles(member, roblox_id)
+        if result is None:
+            return None
+        changed = changed or result
+    return changed
+
+def role_sync_busy() -> bool:
+    # Hold off until the guild cache is ready, and yield to interactive lookups already queued
+    return not bot.is_ready() or roblox_limiters["inventory"].queue_depth > 0
+
+role_sync = RoleSyncScheduler(
+    role_sync_state_file,
+    lambda: link_store.iter_links(),
+    sync_linked_user,
+    cycle_period=ROLE_SYNC_CYCLE_HOURS * 3600,
+    tick=ROLE_SYNC_TICK_SECONDS,
+    budget_per_minute=ROLE_SYNC_BUDGET_PER_MINUTE,
+    active_window=ROLE_SYNC_ACTIVE_HOURS * 3600,
+    active_speedup=ROLE_SYNC_ACTIVE_SPEEDUP,
+    checkpoint_interval=ROLE_SYNC_CHECKPOINT_SECONDS,
+    is_busy=role_sync_busy
+)
+
+# ------------------- Render Backend Webserver -------------------
+
+async def handle_redeem(request):
+    try:
+        data = await request.json()
+        code = data.get("code")
+        discord_id = data.get("discord_id")
+        if not code or not discord_id:
+            logger.warning(f"Missing code or discord_id in /redeem: {data}")
+            return web.json_response({"error": "Missing code or discord_id"}, status=400)
+
+        download_token = secrets.token_urlsafe(16)
+        expiry = time.time() + 300  # 5 minutes
+        add_pending_code(code, {
+            "discord_id": discord_id,
+            "expiry": expiry,
+            "download_token": download_token
+        })
+        # Persist to the link store immediately to survive restarts
+        link_store.apply("code_issued", code=code, discord_id=discord_id, expiry=expiry, download_token=download_token)
+        logger.info(f"Stored code {code} for discord_id {discord_id} in /redeem")
+        return web.json_response({"message": "Code stored successfully"})
+    except Exception as e:
+        logger.error(f"Error in handle_redeem: {str(e)}")
+        return web.json_response({"error": "Server error"}, status=500)
+
+async def handle_download(request):
+    try:
+        token = request.query.get("token")
+        if not token:
+            logger.warning("Missing token in /download")
+            return web.json_response({"error": "Missing token"}, status=400)
+
+        match = link_store.find_download_token(token)
+        if match is not None and time.time() < match[1]["expiry"]:
+            if not os.path.exists(ZIP_FILE_PATH):
+                logger.error(f"Zip file not found at {ZIP_FILE_PATH}")
+                return web.json_response({"error": "File not found"}, status=404)
+            logger.info(f"Serving zip file for token {token}")
+            return web.FileResponse(ZIP_FILE_PATH, headers={
+                "Content-Disposition": "attachment; filename=app.zip"
+            })
+
+
+        logger.warning(f"Invalid or expired token in /download: {token}")
+        return web.json_response({"error": "Invalid or expired token"}, status=401)
+    except Exception as e:
+        logger.error(f"Error in handle_download: {str(e)}")
+        return web.json_response({"error": "Server error"}, status=500)
+
+async def run_webserver():
+    try:
+        app = web.Application()
+        app.router.add_get('/', lambda r: web.Response(text="Bot is running"))
+        app.router.add_post('/redeem', handle_redeem)
+        app.router.add_get('/download', handle_download)
+        port = int(os.environ.get("PORT", 8080))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '0.0.0.0', port)
+        await site.start()
+        logger.info(f"Web server running on port {port}")
+    except Exception as e:
+        logger.error(f"Error starting webserver: {e}")
+
+# ------------------- Events -------------------
+
+@bot.event
+async def on_ready():
+    try:
+        await bot.tree.sync()
+        logger.info(f"Logged in as {bot.user}")
+    except Exception as e:
+        logger.error(f"Error in on_ready: {e}")
+
+@bot.event
+async def on_interaction(interaction: discord.Interaction):
+    # Recently active users get their roles re-checked sooner
+    role_sync.mark_active(str(interaction.user.id))
+
+# ------------------- Run Bot & Webserver -------------------
+
+async def main():
+    await link_store.start()
+    get_http_session()
+    await roblox_cache_snapshots.start()
+    if ROLE_SYNC_ENABLED:
+        await role_sync.start()
+    code_sweeper = asyncio.create_task(run_code_sweeper())
+    try:
+        await run_webserver()
+        await bot.start(os.getenv("DISCORD_TOKEN"))
+    finally:
+        code_sweeper.cancel()
+        await role_sync.stop()
+        await roblox_cache_snapshots.stop()
+        await close_http_session()
+        await link_store.stop()
+
+if __name__ == "__main__":
+    load_dotenv()
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        logger.error(f"Error in main: {e}")
@@ -0,0 +1,414 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from storage import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# ------------------- Request Coalescing -------------------
+
+class MicroBatcher:
+    # Collects keys submitted within `window` seconds (or until `max_batch` distinct keys)
+    # and resolves them with one fetch_batch call, fanning the results back out to callers.
+    def __init__(self, fetch_batch: Callable[[List[Hashable]], Awaitable[Dict]], window: float = 0.05, max_batch: int = 100):
+        self.fetch_batch = fetch_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self.stats = {
+            "batches": 0,
+            "keys": 0,
+            "callers": 0,
+            "max_batch_size": 0,
+        }
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.setdefault(key, []).append(future)
+        self.stats["callers"] += 1
+        if len(self.pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = {}
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Hashable, List[asyncio.Future]]):
+        self.stats["batches"] += 1
+        self.stats["keys"] += len(batch)
+        self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+        try:
+            results = await self.fetch_batch(list(batch))
+        except BaseException as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        for key, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(key))
+
+# ------------------- Single-Flight -------------------
+
+class SingleFlight:
+    # Concurrent calls for the same key share one in-flight fetch. The fetch runs in its own
+    # task, so a caller that gives up (cancelled) doesn't cancel it for the others; errors
+    # and cancellation of the fetch itself reach every caller.
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {
+            "fetches": 0,
+            "shared": 0,
+        }
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fetch())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+            self.stats["fetches"] += 1
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller was cancelled meanwhile
+            task.exception()
+
+# ------------------- Rate Limiting -------------------
+
+def parse_retry_after(value: Optional[str], default: float = 5.0) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        # HTTP-date form or missing header
+        return default
+
+class TokenBucketLimiter:
+    # Per-host token bucket with FIFO waiters and a cap on requests in flight. On a 429 the
+    # bucket stops granting until Retry-After passes and halves its rate, then recovers
+    # gradually as requests succeed again.
+    def __init__(self, name: str, rate: float, burst: int, max_in_flight: int):
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.waiters = deque()
+        self.stats = {
+            "acquired": 0,
+            "throttled": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "max_queue_depth": 0,
+        }
+        self._updated = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.waiters)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    async def acquire(self):
+        start = time.monotonic()
+        if not self.waiters and self._try_take():
+            self._record_wait(start)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self.waiters))
+        self._grant()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot to the next waiter
+                self.release()
+            else:
+                self._grant()
+            raise
+        self._record_wait(start)
+
+    def release(self):
+        self.in_flight -= 1
+        self._grant()
+
+    def penalize(self, retry_after: float):
+        self.stats["throttled"] += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.tokens = 0.0
+        self.rate = max(self.base_rate / 8, self.rate / 2)
+        logger.warning(f"Roblox {self.name} API throttled; pausing {retry_after:.1f}s, rate now {self.rate:.2f}/s")
+
+    def record_success(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self) -> bool:
+        self._refill()
+        if time.monotonic() < self.blocked_until or self.tokens < 1 or self.in_flight >= self.max_in_flight:
+            return False
+        self.tokens -= 1
+        self.in_flight += 1
+        return True
+
+    def _grant(self):
+        # Wake waiters strictly in arrival order while capacity lasts
+        while self.waiters:
+            head = self.waiters[0]
+            if head.done():
+                self.waiters.popleft()
+                continue
+            if not self._try_take():
+                break
+            self.waiters.popleft()
+            head.set_result(None)
+        if self.waiters and self._timer is None and self.in_flight < self.max_in_flight:
+            # Blocked on tokens or Retry-After rather than in-flight slots (release() handles those)
+            delay = max(self.blocked_until - time.monotonic(), (1 - self.tokens) / self.rate, 0.001)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._grant()
+
+    def _record_wait(self, start: float):
+        waited_ms = (time.monotonic() - start) * 1000
+        self.stats["acquired"] += 1
+        self.stats["total_wait_ms"] += waited_ms
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], waited_ms)
+
+# ------------------- Lookup Cache -------------------
+
+CACHE_FRESH = "fresh"
+CACHE_STALE = "stale"
+CACHE_MISS = "miss"
+
+class LookupCache:
+    # Bounded LRU with per-entry TTLs. Positive entries may be served stale for `stale_ttl`
+    # seconds past expiry while a background refresh runs; negative entries (e.g. unknown
+    # usernames) use their own, shorter TTL and are never served stale.
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float, stale_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.entries: "OrderedDict[str, list]" = OrderedDict()  # key -> [value, stored_at, ttl, stale_ttl]
+        self.refreshing: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "refreshes": 0,
+            "restored": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Tuple[str, object]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return CACHE_MISS, None
+        value, stored_at, ttl, stale_ttl = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            if value is None:
+                self.stats["negative_hits"] += 1
+            return CACHE_FRESH, value
+        if age < ttl + stale_ttl:
+            self.entries.move_to_end(key)
+            self.stats["stale_hits"] += 1
+            return CACHE_STALE, value
+        del self.entries[key]
+        self.stats["expirations"] += 1
+        self.stats["misses"] += 1
+        return CACHE_MISS, None
+
+    def peek(self, key: str) -> Tuple[str, object]:
+        # Like get() but without touching LRU order or counters
+        entry = self.entries.get(key)
+        if entry is None:
+            return CACHE_MISS, None
+        value, stored_at, ttl, stale_ttl = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            return CACHE_FRESH, value
+        if age < ttl + stale_ttl:
+            return CACHE_STALE, value
+        return CACHE_MISS, None
+
+    def set(self, key: str, value, stored_at: Optional[float] = None):
+        negative = value is None
+        self.entries[key] = [
+            value,
+            time.time() if stored_at is None else stored_at,
+            self.negative_ttl if negative else self.ttl,
+            0.0 if negative else self.stale_ttl
+        ]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def export_entries(self) -> List[list]:
+        # [key, value, stored_at] in LRU order, oldest first
+        return [[key, entry[0], entry[1]] for key, entry in self.entries.items()]
+
+    def restore(self, entries: List[list]) -> int:
+        # Entries from a snapshot (oldest first) go behind everything already cached, so they
+        # never replace live answers and are the first to be evicted. Expired ones are skipped.
+        now = time.time()
+        restored = 0
+        for key, value, stored_at in reversed(entries):
+            if key in self.entries:
+                continue
+            if len(self.entries) >= self.max_entries:
+                break
+            negative = value is None
+            ttl = self.negative_ttl if negative else self.ttl
+            stale_ttl = 0.0 if negative else self.stale_ttl
+            if now - stored_at >= ttl + stale_ttl:
+                continue
+            self.entries[key] = [value, stored_at, ttl, stale_ttl]
+            self.entries.move_to_end(key, last=False)
+            restored += 1
+        self.stats["restored"] += restored
+        return restored
+
+    def refresh_in_background(self, key: str, fetch: Callable[[], Awaitable]):
+        # At most one refresh per key; the fetch is expected to store its own result
+        if key in self.refreshing:
+            return
+        self.stats["refreshes"] += 1
+        task = asyncio.create_task(fetch())
+        self.refreshing[key] = task
+        task.add_done_callback(lambda done: self._refresh_done(key, done))
+
+    def _refresh_done(self, key: str, task: asyncio.Task):
+        self.refreshing.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background refresh failed for {key}: {task.exception()}")
+
+# ------------------- Cache Snapshots -------------------
+
+def read_cache_snapshot(path: str) -> List[list]:
+    with open(path, "r") as f:
+        return json.load(f).get("entries", [])
+
+class CacheSnapshotter:
+    # Saves a LookupCache to `path` every `interval` seconds and on stop. start() warms the
+    # cache from the last snapshot in the background, in chunks, so startup never waits on it.
+    def __init__(self, cache: LookupCache, path: str, interval: float = 300.0, chunk: int = 5000):
+        self.cache = cache
+        self.path = path
+        self.interval = interval
+        self.chunk = chunk
+        self.stats = {
+            "loaded": 0,
+            "load_ms": 0.0,
+            "saves": 0,
+            "last_save_entries": 0,
+            "last_save_bytes": 0,
+        }
+        self._load_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._load_task = asyncio.create_task(self.load())
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        for task in (self._load_task, self._task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._load_task = None
+        self._task = None
+        await self.save()
+
+    async def load(self):
+        start = time.perf_counter()
+        try:
+            entries = await asyncio.to_thread(read_cache_snapshot, self.path)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read cache snapshot {self.path}: {e}")
+            return
+        restored = 0
+        # Newest chunk first so the freshest entries win if the cache fills up
+        for end in range(len(entries), 0, -self.chunk):
+            restored += self.cache.restore(entries[max(0, end - self.chunk):end])
+            await asyncio.sleep(0)
+        self.stats["loaded"] = restored
+        self.stats["load_ms"] = (time.perf_counter() - start) * 1000
+        logger.info(f"Warmed cache with {restored} of {len(entries)} snapshot entries in {self.stats['load_ms']:.0f}ms")
+
+    async def save(self):
+        entries = self.cache.export_entries()
+        try:
+            written = await asyncio.to_thread(atomic_write_json, self.path, {"saved_at": time.time(), "entries": entries})
+        except OSError as e:
+            logger.error(f"Could not write cache snapshot {self.path}: {e}")
+            return
+        self.stats["saves"] += 1
+        self.stats["last_save_entries"] = len(entries)
+        self.stats["last_save_bytes"] = written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
@@ -0,0 +1,174 @@
+import asyncio
+import heapq
+import json
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from storage import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# ------------------- Role Reconciliation Scheduler -------------------
+
+class RoleSyncScheduler:
+    # Walks every link once per `cycle_period` seconds in small batches, one batch per `tick`.
+    # Batches are the most overdue users first; users active within `active_window` come due
+    # `active_speedup` times as often. At most `budget_per_minute` users are checked per
+    # minute, and a tick is skipped while `is_busy()` says interactive traffic is queued.
+    # Last-checked and activity times are checkpointed to `state_path` so restarts resume.
+    def __init__(
+        self,
+        state_path: str,
+        list_links: Callable[[], Iterator[Tuple[str, int]]],
+        sync_user: Callable[[str, int], Awaitable[Optional[bool]]],
+        cycle_period: float = 86400.0,
+        tick: float = 30.0,
+        budget_per_minute: float = 60.0,
+        active_window: float = 86400.0,
+        active_speedup: float = 4.0,
+        checkpoint_interval: float = 300.0,
+        is_busy: Optional[Callable[[], bool]] = None
+    ):
+        self.state_path = state_path
+        self.list_links = list_links
+        self.sync_user = sync_user
+        self.cycle_period = cycle_period
+        self.tick = tick
+        self.budget_per_minute = budget_per_minute
+        self.active_window = active_window
+        self.active_speedup = active_speedup
+        self.checkpoint_interval = checkpoint_interval
+        self.is_busy = is_busy
+        self.last_checked: Dict[str, float] = {}
+        self.last_active: Dict[str, float] = {}
+        self.dirty = False
+        self.stats = {
+            "ticks": 0,
+            "busy_skips": 0,
+            "checked": 0,
+            "changed": 0,
+            "failed": 0,
+            "overdue": 0,
+            "checkpoints": 0,
+            "last_batch_ms": 0.0,
+        }
+        self._last_checkpoint = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self):
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read role sync checkpoint {self.state_path}: {e}")
+            return
+        self.last_checked = state.get("last_checked", {})
+        self.last_active = state.get("last_active", {})
+        logger.info(f"Resuming role sync with {len(self.last_checked)} checked users from {self.state_path}")
+
+    def mark_active(self, discord_id: str):
+        self.last_active[discord_id] = time.time()
+        self.dirty = True
+
+    def batch_size(self, link_count: int) -> int:
+        # Enough per tick to finish a cycle on time, capped by the API budget
+        needed = math.ceil(link_count * self.tick / self.cycle_period)
+        allowed = max(1, int(self.budget_per_minute * self.tick / 60))
+        return min(needed, allowed)
+
+    def due_batch(self, now: float) -> list:
+        links = list(self.list_links())
+        size = self.batch_size(len(links))
+        if size <= 0:
+            return []
+
+        def next_due(link: Tuple[str, int]) -> float:
+            discord_id = link[0]
+            period = self.cycle_period
+            if now - self.last_active.get(discord_id, 0.0) < self.active_window:
+                period /= self.active_speedup
+            return self.last_checked.get(discord_id, 0.0) + period
+
+        batch = heapq.nsmallest(size, links, key=next_due)
+        batch = [link for link in batch if next_due(link) <= now]
+        self.stats["overdue"] = sum(1 for link in links if next_due(link) <= now - self.cycle_period)
+        return batch
+
+    async def run_batch(self) -> int:
+        start = time.perf_counter()
+        batch = self.due_batch(time.time())
+        for discord_id, roblox_id in batch:
+            try:
+                changed = await self.sync_user(discord_id, roblox_id)
+            except Exception as e:
+                logger.error(f"Role sync failed for discord_id {discord_id}: {e}")
+                changed = None
+            if changed is None:
+                # No definitive answer; leave it due so it is retried next tick
+                self.stats["failed"] += 1
+                continue
+            self.last_checked[discord_id] = time.time()
+            self.dirty = True
+            self.stats["checked"] += 1
+            if changed:
+                self.stats["changed"] += 1
+        self.stats["last_batch_ms"] = (time.perf_counter() - start) * 1000
+        return len(batch)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self.load()
+        link_count = sum(1 for _ in self.list_links())
+        if math.ceil(link_count * self.tick / self.cycle_period) > self.budget_per_minute * self.tick / 60:
+            hours = link_count / self.budget_per_minute / 60
+            logger.warning(f"Role sync budget of {self.budget_per_minute:g}/min needs {hours:.1f}h to cover {link_count} links, longer than the configured cycle")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.checkpoint()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            self.stats["ticks"] += 1
+            try:
+                if self.is_busy is not None and self.is_busy():
+                    self.stats["busy_skips"] += 1
+                else:
+                    await self.run_batch()
+                if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                    await self.checkpoint()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Role sync tick failed: {e}")
+
+    async def checkpoint(self):
+        self._last_checkpoint = time.monotonic()
+        if not self.dirty:
+            return
+        # Drop users who have since unlinked
+        linked = {discord_id for discord_id, _ in self.list_links()}
+        self.last_checked = {discord_id: at for discord_id, at in self.last_checked.items() if discord_id in linked}
+        self.last_active = {discord_id: at for discord_id, at in self.last_active.items() if discord_id in linked}
+        state = {"last_checked": dict(self.last_checked), "last_active": dict(self.last_active)}
+        self.dirty = False
+        try:
+            await asyncio.to_thread(atomic_write_json, self.state_path, state)
+            self.stats["checkpoints"] += 1
+        except OSError as e:
+            self.dirty = True
+            logger.error(f"Could not write role sync checkpoint {self.state_path}: {e}")
@@ -0,0 +1,737 @@
+import asyncio
+import heapq
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ------------------- Atomic File Writes -------------------
+
+def atomic_write_json(path: str, data) -> int:
+    # Write to a temp file in the same directory, then rename over the target so
+    # readers (and a crash mid-write) never see a half-written file.
+    payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(payload)
+
+def append_lines(path: str, lines: List[str]) -> int:
+    payload = "".join(lines).encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(payload)
+
+def truncate_file(path: str):
+    with open(path, "wb") as f:
+        f.flush()
+        os.fsync(f.fileno())
+
+# ------------------- Code Indexes -------------------
+
+class ExpiryHeap:
+    # Min-heap of (expiry, key) with lazy deletion: discard() and re-pushes only update
+    # `expiry_by_key`, and outdated heap entries are skipped when they reach the top.
+    # push/discard/pop are O(log n); the heap is rebuilt once dead entries dominate it.
+    def __init__(self):
+        self.heap: List[Tuple[float, str]] = []
+        self.expiry_by_key: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.expiry_by_key)
+
+    def push(self, key: str, expiry: float):
+        self.expiry_by_key[key] = expiry
+        heapq.heappush(self.heap, (expiry, key))
+        if len(self.heap) > 2 * len(self.expiry_by_key) + 1024:
+            self.heap = [(expiry, key) for key, expiry in self.expiry_by_key.items()]
+            heapq.heapify(self.heap)
+
+    def discard(self, key: str):
+        self.expiry_by_key.pop(key, None)
+
+    def pop_expired(self, now: float, limit: Optional[int] = None) -> List[str]:
+        expired = []
+        while self.heap and self.heap[0][0] <= now and (limit is None or len(expired) < limit):
+            expiry, key = heapq.heappop(self.heap)
+            if self.expiry_by_key.get(key) == expiry:
+                del self.expiry_by_key[key]
+                expired.append(key)
+        return expired
+
+class CodeIndex:
+    # Secondary indexes over a {code: {"discord_id", "download_token", "expiry"}} mapping, so token
+    # lookups are O(1), per-user invalidation costs O(that user's codes) and expired codes come
+    # off an expiry heap in O(log n) each
+    def __init__(self):
+        self.by_token: Dict[str, str] = {}
+        self.by_user: Dict[str, Set[str]] = {}
+        self.by_expiry = ExpiryHeap()
+
+    def rebuild(self, codes: Dict[str, Dict]):
+        self.by_token = {}
+        self.by_user = {}
+        self.by_expiry = ExpiryHeap()
+        for code, data in codes.items():
+            self.add(code, data)
+
+    def add(self, code: str, data: Dict):
+        self.by_token[data["download_token"]] = code
+        self.by_user.setdefault(data["discord_id"], set()).add(code)
+        self.by_expiry.push(code, data["expiry"])
+
+    def remove(self, code: str, data: Dict):
+        if self.by_token.get(data["download_token"]) == code:
+            del self.by_token[data["download_token"]]
+        user_codes = self.by_user.get(data["discord_id"])
+        if user_codes is not None:
+            user_codes.discard(code)
+            if not user_codes:
+                del self.by_user[data["discord_id"]]
+        self.by_expiry.discard(code)
+
+    def expired_codes(self, now: float, limit: Optional[int] = None) -> List[str]:
+        # Expired codes in expiry order; they stop being tracked for expiry but stay in the
+        # other indexes until the caller removes them
+        return self.by_expiry.pop_expired(now, limit)
+
+    def code_for_token(self, token: str) -> Optional[str]:
+        return self.by_token.get(token)
+
+    def codes_for_user(self, discord_id: str) -> List[str]:
+        return list(self.by_user.get(discord_id, ()))
+
+# ------------------- Journal Records -------------------
+
+# Every mutation of linked_accounts is expressed as one of these records so it can be
+# appended to the journal and replayed on startup. In memory, force_linked_users is kept as
+# a dict used as an ordered set (O(1) membership); it is written out as a list.
+JOURNAL_OPS = ("link", "force_link", "unlink", "code_issued", "code_verified", "device_unlinked", "codes_expired")
+
+def apply_journal_record(accounts: Dict, record: Dict, code_index: Optional[CodeIndex] = None):
+    op = record["op"]
+    if op in ("link", "force_link"):
+        discord_id = record["discord_id"]
+        roblox_id = record["roblox_id"]
+        accounts["discord_to_roblox"][discord_id] = roblox_id
+        accounts["roblox_to_discord"][str(roblox_id)] = discord_id
+        if op == "force_link":
+            accounts["force_linked_users"][discord_id] = True
+    elif op == "unlink":
+        discord_id = record["discord_id"]
+        roblox_id = accounts["discord_to_roblox"].pop(discord_id, None)
+        if roblox_id is not None:
+            accounts["roblox_to_discord"].pop(str(roblox_id), None)
+        accounts["force_linked_users"].pop(discord_id, None)
+    elif op in ("code_issued", "code_verified"):
+        code = record["code"]
+        previous = accounts["generated_codes"].get(code)
+        if code_index is not None and previous is not None:
+            code_index.remove(code, previous)
+        data = {
+            "discord_id": record["discord_id"],
+            "expiry": record["expiry"],
+            "download_token": record["download_token"]
+        }
+        accounts["generated_codes"][code] = data
+        if code_index is not None:
+            code_index.add(code, data)
+        if op == "code_verified":
+            accounts["linked_devices"][record["discord_id"]] = {"linked": True}
+    elif op == "device_unlinked":
+        discord_id = record["discord_id"]
+        if code_index is not None:
+            codes_to_remove = code_index.codes_for_user(discord_id)
+        else:
+            codes_to_remove = [code for code, data in accounts["generated_codes"].items() if data["discord_id"] == discord_id]
+        for code in codes_to_remove:
+            data = accounts["generated_codes"].pop(code)
+            if code_index is not None:
+                code_index.remove(code, data)
+        accounts["linked_devices"].pop(discord_id, None)
+    elif op == "codes_expired":
+        # One record per sweep batch
+        for code in record["codes"]:
+            data = accounts["generated_codes"].pop(code, None)
+            if code_index is not None and data is not None:
+                code_index.remove(code, data)
+    else:
+        raise ValueError(f"Unknown journal op: {op}")
+
+# ------------------- Journaled Write-Behind Persistence -------------------
+
+class JournalWriter:
+    def __init__(
+        self,
+        snapshot_path: str,
+        journal_path: str,
+        snapshot: Callable[[], Dict],
+        flush_interval: float = 0.5,
+        max_pending: int = 100,
+        compact_records: int = 10000,
+        compact_interval: float = 3600
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.snapshot = snapshot  # Called on the event loop; must return data safe to serialize off-loop
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.compact_records = compact_records
+        self.compact_interval = compact_interval
+        self.seq = 0
+        self.journal_records = 0
+        self.pending: List[str] = []
+        self.last_compaction = time.monotonic()
+        self.stats = {
+            "flushes": 0,
+            "coalesced_writes": 0,
+            "failed_flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "journal_bytes": 0,
+            "compactions": 0,
+            "last_compaction_ms": 0.0,
+            "last_snapshot_bytes": 0,
+        }
+        self._dirty: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- startup ----
+
+    def replay(self, apply: Callable[[Dict], None], snapshot_seq: int = 0) -> int:
+        self.seq = snapshot_seq
+        replayed = 0
+        if not os.path.exists(self.journal_path):
+            return 0
+        with open(self.journal_path, "r") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                self.journal_records += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-append; everything before it is intact
+                    logger.warning(f"Skipping unreadable journal line {line_number} in {self.journal_path}")
+                    continue
+                if record.get("seq", 0) <= snapshot_seq:
+                    continue  # Already folded into the snapshot
+                apply(record)
+                self.seq = record["seq"]
+                replayed += 1
+        logger.info(f"Replayed {replayed} journal records from {self.journal_path}")
+        return replayed
+
+    # ---- mutations ----
+
+    def append(self, record: Dict):
+        self.seq += 1
+        record["seq"] = self.seq
+        self.pending.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if self._task is None:
+            # No background task (e.g. scripts importing the bot): write through synchronously
+            self.flush_sync()
+            return
+        self._dirty.set()
+        if len(self.pending) >= self.max_pending:
+            self._full.set()
+
+    # ---- background flushing ----
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._dirty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Journaled persistence started for {self.snapshot_path} (interval {self.flush_interval * 1000:.0f} ms, max {self.max_pending} writes)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self.flush()
+        await self.compact()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout=self.compact_interval)
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush()
+            except asyncio.TimeoutError:
+                pass
+            if self._compaction_due():
+                await self.compact()
+
+    def _compaction_due(self) -> bool:
+        if self.journal_records == 0:
+            return False
+        if self.journal_records >= self.compact_records:
+            return True
+        return time.monotonic() - self.last_compaction >= self.compact_interval
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            lines = self.pending
+            self.pending = []
+            self._dirty.clear()
+            self._full.clear()
+            start = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(append_lines, self.journal_path, lines)
+            except Exception as e:
+                # Put the records back in front so the next tick retries them in order
+                self.pending = lines + self.pending
+                self._dirty.set()
+                self.stats["failed_flushes"] += 1
+                logger.error(f"Failed to append to {self.journal_path}: {e}")
+                return
+            self._record_flush(start, len(lines), written)
+
+    async def compact(self):
+        async with self._lock:
+            # The snapshot is taken on the loop, so it reflects exactly the records up to self.seq;
+            # unflushed records are already folded into it, and anything appended while the thread
+            # runs stays in self.pending for the fresh journal.
+            data = self.snapshot()
+            data["journal_seq"] = self.seq
+            pending = self.pending
+            self.pending = []
+            start = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(self._write_snapshot, data)
+            except Exception as e:
+                self.pending = pending + self.pending
+                logger.error(f"Failed to compact {self.snapshot_path}: {e}")
+                return
+            self._record_compaction(start, written)
+
+    def _write_snapshot(self, data: Dict) -> int:
+        written = atomic_write_json(self.snapshot_path, data)
+        # A crash between these two steps is harmless: replay skips records at or below journal_seq
+        truncate_file(self.journal_path)
+        return written
+
+    def flush_sync(self):
+        if not self.pending:
+            return
+        lines = self.pending
+        self.pending = []
+        start = time.perf_counter()
+        try:
+            written = append_lines(self.journal_path, lines)
+        except Exception as e:
+            self.pending = lines + self.pending
+            self.stats["failed_flushes"] += 1
+            logger.error(f"Failed to append to {self.journal_path}: {e}")
+            return
+        self._record_flush(start, len(lines), written)
+        if self._compaction_due():
+            data = self.snapshot()
+            data["journal_seq"] = self.seq
+            start = time.perf_counter()
+            try:
+                written = self._write_snapshot(data)
+            except Exception as e:
+                logger.error(f"Failed to compact {self.snapshot_path}: {e}")
+                return
+            self._record_compaction(start, written)
+
+    def _record_flush(self, start: float, coalesced: int, written: int):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.journal_records += coalesced
+        self.stats["flushes"] += 1
+        self.stats["coalesced_writes"] += coalesced - 1
+        self.stats["last_flush_ms"] = elapsed_ms
+        self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+        self.stats["total_flush_ms"] += elapsed_ms
+        self.stats["journal_bytes"] += written
+        logger.info(f"Appended {coalesced} records to {self.journal_path} in {elapsed_ms:.1f} ms ({written} bytes)")
+
+    def _record_compaction(self, start: float, written: int):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.journal_records = 0
+        self.last_compaction = time.monotonic()
+        self.stats["compactions"] += 1
+        self.stats["last_compaction_ms"] = elapsed_ms
+        self.stats["last_snapshot_bytes"] = written
+        self.stats["journal_bytes"] = 0
+        logger.info(f"Compacted journal into {self.snapshot_path} in {elapsed_ms:.1f} ms ({written} bytes)")
+
+# ------------------- Loading -------------------
+
+def empty_accounts() -> Dict:
+    return {
+        "discord_to_roblox": {},
+        "roblox_to_discord": {},
+        "force_linked_users": {},
+        "generated_codes": {},
+        "linked_devices": {}
+    }
+
+def load_accounts_file(path: str) -> Tuple[Dict, int]:
+    # Returns the accounts plus the journal sequence number folded into the snapshot
+    try:
+        with open(path, "r") as f:
+            temp_accounts = json.load(f)
+    except FileNotFoundError:
+        return empty_accounts(), 0
+    if not isinstance(temp_accounts, dict) or ("discord_to_roblox" not in temp_accounts and "roblox_to_discord" not in temp_accounts):
+        # Legacy format: a flat {discord_id: roblox_id} mapping
+        accounts = empty_accounts()
+        for discord_id, roblox_id in temp_accounts.items():
+            accounts["discord_to_roblox"][discord_id] = roblox_id
+            accounts["roblox_to_discord"][str(roblox_id)] = discord_id
+        return accounts, 0
+    journal_seq = temp_accounts.pop("journal_seq", 0)
+    accounts = empty_accounts()
+    accounts.update(temp_accounts)
+    accounts["force_linked_users"] = dict.fromkeys(accounts["force_linked_users"], True)
+    return accounts, journal_seq
+
+# ------------------- Link Stores -------------------
+
+class LinkStore:
+    backend = "base"
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def apply(self, op: str, **fields):
+        raise NotImplementedError
+
+    def get_roblox_id(self, discord_id: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def get_discord_id(self, roblox_id) -> Optional[str]:
+        raise NotImplementedError
+
+    def is_force_linked(self, discord_id: str) -> bool:
+        raise NotImplementedError
+
+    def has_linked_device(self, discord_id: str) -> bool:
+        raise NotImplementedError
+
+    def find_download_token(self, token: str) -> Optional[Tuple[str, Dict]]:
+        raise NotImplementedError
+
+    def iter_links(self) -> Iterator[Tuple[str, int]]:
+        raise NotImplementedError
+
+    def count_links(self) -> int:
+        raise NotImplementedError
+
+    def count_codes(self) -> int:
+        raise NotImplementedError
+
+    def expired_codes(self, now: float, limit: int) -> List[str]:
+        # Up to `limit` generated codes whose expiry has passed, oldest first; remove them with codes_expired
+        raise NotImplementedError
+
+    def export_accounts(self) -> Dict:
+        # Full dump in the linked_accounts.json layout
+        raise NotImplementedError
+
+    @property
+    def stats(self) -> Dict:
+        return {}
+
+class JsonLinkStore(LinkStore):
+    backend = "json"
+
+    def __init__(self, snapshot_path: str, journal_path: str, **writer_options):
+        self.accounts, snapshot_seq = load_accounts_file(snapshot_path)
+        self.code_index = CodeIndex()
+        self.rebuild_indexes()
+        self.writer = JournalWriter(snapshot_path, journal_path, self.export_accounts, **writer_options)
+        self.writer.replay(lambda record: apply_journal_record(self.accounts, record, self.code_index), snapshot_seq)
+
+    def rebuild_indexes(self):
+        self.code_index.rebuild(self.accounts["generated_codes"])
+
+    async def start(self):
+        await self.writer.start()
+
+    async def stop(self):
+        await self.writer.stop()
+
+    def apply(self, op: str, **fields):
+        # Apply in memory, then append to the journal (O(1) per change)
+        record = {"op": op, **fields}
+        apply_journal_record(self.accounts, record, self.code_index)
+        self.writer.append(record)
+
+    def get_roblox_id(self, discord_id: str) -> Optional[int]:
+        return self.accounts["discord_to_roblox"].get(discord_id)
+
+    def get_discord_id(self, roblox_id) -> Optional[str]:
+        return self.accounts["roblox_to_discord"].get(str(roblox_id))
+
+    def is_force_linked(self, discord_id: str) -> bool:
+        return discord_id in self.accounts["force_linked_users"]
+
+    def has_linked_device(self, discord_id: str) -> bool:
+        return discord_id in self.accounts["linked_devices"]
+
+    def find_download_token(self, token: str) -> Optional[Tuple[str, Dict]]:
+        code = self.code_index.code_for_token(token)
+        if code is None:
+            return None
+        data = self.accounts["generated_codes"][code]
+        if not hmac.compare_digest(data["download_token"], token):
+            return None
+        return code, data
+
+    def iter_links(self) -> Iterator[Tuple[str, int]]:
+        return iter(list(self.accounts["discord_to_roblox"].items()))
+
+    def count_links(self) -> int:
+        return len(self.accounts["discord_to_roblox"])
+
+    def count_codes(self) -> int:
+        return len(self.accounts["generated_codes"])
+
+    def expired_codes(self, now: float, limit: int) -> List[str]:
+        return self.code_index.expired_codes(now, limit)
+
+    def export_accounts(self) -> Dict:
+        # Shallow-copy each section on the event loop so the writer thread never sees a dict mid-mutation.
+        # Entries themselves are replaced rather than mutated in place, so sharing them is safe.
+        return {
+            "discord_to_roblox": dict(self.accounts["discord_to_roblox"]),
+            "roblox_to_discord": dict(self.accounts["roblox_to_discord"]),
+            "force_linked_users": list(self.accounts["force_linked_users"]),
+            "generated_codes": dict(self.accounts["generated_codes"]),
+            "linked_devices": dict(self.accounts["linked_devices"])
+        }
+
+    @property
+    def stats(self) -> Dict:
+        return self.writer.stats
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    discord_id TEXT PRIMARY KEY,
+    roblox_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_links_roblox_id ON links (roblox_id);
+CREATE TABLE IF NOT EXISTS force_links (
+    discord_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS codes (
+    code TEXT PRIMARY KEY,
+    discord_id TEXT NOT NULL,
+    expiry REAL NOT NULL,
+    download_token TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_codes_download_token ON codes (download_token);
+CREATE INDEX IF NOT EXISTS idx_codes_discord_id ON codes (discord_id);
+CREATE INDEX IF NOT EXISTS idx_codes_expiry ON codes (expiry);
+CREATE TABLE IF NOT EXISTS devices (
+    discord_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+class SqliteLinkStore(LinkStore):
+    # Point lookups and single-row writes on indexed tables take microseconds, so they run
+    # inline on the event loop; nothing is loaded into memory up front.
+    backend = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self._stats = {
+            "writes": 0,
+            "failed_writes": 0,
+            "last_write_ms": 0.0,
+            "max_write_ms": 0.0,
+            "total_write_ms": 0.0,
+        }
+
+    async def stop(self):
+        self.conn.close()
+
+    def apply(self, op: str, **fields):
+        start = time.perf_counter()
+        try:
+            with self.conn:
+                self._apply(op, fields)
+        except Exception:
+            self._stats["failed_writes"] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._stats["writes"] += 1
+        self._stats["last_write_ms"] = elapsed_ms
+        self._stats["max_write_ms"] = max(self._stats["max_write_ms"], elapsed_ms)
+        self._stats["total_write_ms"] += elapsed_ms
+
+    def _apply(self, op: str, fields: Dict):
+        # Mirrors apply_journal_record for the JSON store
+        if op in ("link", "force_link"):
+            self.conn.execute("INSERT OR REPLACE INTO links (discord_id, roblox_id) VALUES (?, ?)", (fields["discord_id"], int(fields["roblox_id"])))
+            if op == "force_link":
+                self.conn.execute("INSERT OR IGNORE INTO force_links (discord_id) VALUES (?)", (fields["discord_id"],))
+        elif op == "unlink":
+            self.conn.execute("DELETE FROM links WHERE discord_id = ?", (fields["discord_id"],))
+            self.conn.execute("DELETE FROM force_links WHERE discord_id = ?", (fields["discord_id"],))
+        elif op in ("code_issued", "code_verified"):
+            self.conn.execute(
+                "INSERT OR REPLACE INTO codes (code, discord_id, expiry, download_token) VALUES (?, ?, ?, ?)",
+                (fields["code"], fields["discord_id"], fields["expiry"], fields["download_token"])
+            )
+            if op == "code_verified":
+                self.conn.execute("INSERT OR IGNORE INTO devices (discord_id) VALUES (?)", (fields["discord_id"],))
+        elif op == "device_unlinked":
+            self.conn.execute("DELETE FROM codes WHERE discord_id = ?", (fields["discord_id"],))
+            self.conn.execute("DELETE FROM devices WHERE discord_id = ?", (fields["discord_id"],))
+        elif op == "codes_expired":
+            self.conn.executemany("DELETE FROM codes WHERE code = ?", ((code,) for code in fields["codes"]))
+        else:
+            raise ValueError(f"Unknown journal op: {op}")
+
+    def get_roblox_id(self, discord_id: str) -> Optional[int]:
+        row = self.conn.execute("SELECT roblox_id FROM links WHERE discord_id = ?", (discord_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_discord_id(self, roblox_id) -> Optional[str]:
+        # Force-links can point several Discord users at one Roblox account; the latest link wins,
+        # matching roblox_to_discord in the JSON store.
+        row = self.conn.execute("SELECT discord_id FROM links WHERE roblox_id = ? ORDER BY rowid DESC LIMIT 1", (int(roblox_id),)).fetchone()
+        return row[0] if row else None
+
+    def is_force_linked(self, discord_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM force_links WHERE discord_id = ?", (discord_id,)).fetchone() is not None
+
+    def has_linked_device(self, discord_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM devices WHERE discord_id = ?", (discord_id,)).fetchone() is not None
+
+    def find_download_token(self, token: str) -> Optional[Tuple[str, Dict]]:
+        row = self.conn.execute("SELECT code, discord_id, expiry, download_token FROM codes WHERE download_token = ?", (token,)).fetchone()
+        if row is None or not hmac.compare_digest(row[3], token):
+            return None
+        return row[0], {"discord_id": row[1], "expiry": row[2], "download_token": row[3]}
+
+    def iter_links(self) -> Iterator[Tuple[str, int]]:
+        return iter(self.conn.execute("SELECT discord_id, roblox_id FROM links ORDER BY rowid"))
+
+    def count_links(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def count_codes(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM codes").fetchone()[0]
+
+    def expired_codes(self, now: float, limit: int) -> List[str]:
+        # Range scan on idx_codes_expiry
+        return [row[0] for row in self.conn.execute("SELECT code FROM codes WHERE expiry <= ? ORDER BY expiry LIMIT ?", (now, limit))]
+
+    def export_accounts(self) -> Dict:
+        accounts = empty_accounts()
+        for discord_id, roblox_id in self.iter_links():
+            accounts["discord_to_roblox"][discord_id] = roblox_id
+            accounts["roblox_to_discord"][str(roblox_id)] = discord_id
+        accounts["force_linked_users"] = [row[0] for row in self.conn.execute("SELECT discord_id FROM force_links ORDER BY rowid")]
+        for code, discord_id, expiry, download_token in self.conn.execute("SELECT code, discord_id, expiry, download_token FROM codes ORDER BY rowid"):
+            accounts["generated_codes"][code] = {"discord_id": discord_id, "expiry": expiry, "download_token": download_token}
+        for (discord_id,) in self.conn.execute("SELECT discord_id FROM devices ORDER BY rowid"):
+            accounts["linked_devices"][discord_id] = {"linked": True}
+        return accounts
+
+    def import_accounts(self, accounts: Dict):
+        # Bulk load in one transaction (used by the JSON migration)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO links (discord_id, roblox_id) VALUES (?, ?)",
+                ((discord_id, int(roblox_id)) for discord_id, roblox_id in accounts["discord_to_roblox"].items())
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO force_links (discord_id) VALUES (?)",
+                ((discord_id,) for discord_id in accounts["force_linked_users"])
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO codes (code, discord_id, expiry, download_token) VALUES (?, ?, ?, ?)",
+                ((code, data["discord_id"], data["expiry"], data["download_token"]) for code, data in accounts["generated_codes"].items())
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO devices (discord_id) VALUES (?)",
+                ((discord_id,) for discord_id in accounts["linked_devices"])
+            )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def stats(self) -> Dict:
+        return self._stats
+
+def migrate_json_to_sqlite(store: SqliteLinkStore, snapshot_path: str, journal_path: str) -> int:
+    # One-shot import of linked_accounts.json (+ journal) into a fresh SQLite store
+    accounts, snapshot_seq = load_accounts_file(snapshot_path)
+    JournalWriter(snapshot_path, journal_path, lambda: accounts).replay(lambda record: apply_journal_record(accounts, record), snapshot_seq)
+    store.import_accounts(accounts)
+    store.set_meta("migrated_from_json", f"{os.path.abspath(snapshot_path)} at {time.time():.0f}")
+    migrated = len(accounts["discord_to_roblox"])
+    logger.info(f"Migrated {migrated} links and {len(accounts['generated_codes'])} codes from {snapshot_path} into {store.path}")
+    return migrated
+
+def open_link_store(backend: str, snapshot_path: str, journal_path: str, db_path: str, **writer_options) -> LinkStore:
+    if backend == "json":
+        return JsonLinkStore(snapshot_path, journal_path, **writer_options)
+    if backend == "sqlite":
+        store = SqliteLinkStore(db_path)
+        if store.get_meta("migrated_from_json") is None:
+            if os.path.exists(snapshot_path) or os.path.exists(journal_path):
+                migrate_json_to_sqlite(store, snapshot_path, journal_path)
+            else:
+                store.set_meta("migrated_from_json", "none")
+        return store
+    raise ValueError(f"Unknown storage backend: {backend}")